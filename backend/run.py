@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""Production entry point: bootstrap the database once, then serve with N worker processes.
+
+    WEB_CONCURRENCY=4 PORT=8001 python run.py
+
+Indexes, migrations and the admin account are set up here in the parent, before
+any worker starts. Workers run with BOOTSTRAP_ON_STARTUP=false and each opens its
+own MongoDB client in its lifespan.
+
+On SIGTERM a worker first fails /api/health/ready and keeps serving for
+SHUTDOWN_PRESTOP_SECONDS, so the load balancer takes it out of rotation. uvicorn
+then stops accepting connections and gives open ones GRACEFUL_SHUTDOWN_SECONDS
+to finish (event streams are cut after that). Last, the lifespan flushes the
+worker's status events and closes its client. A second signal skips the wait.
+
+Rate limit buckets, caches and the matching table are per worker, so rate limits
+apply per worker. REPOSITORY_BACKEND=memory keeps data per process and is only
+served with a single worker.
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import threading
+
+import uvicorn
+
+import server
+
+HOST = os.environ.get('HOST', '0.0.0.0')
+PORT = int(os.environ.get('PORT', '8001'))
+WEB_CONCURRENCY = int(os.environ.get('WEB_CONCURRENCY', str(os.cpu_count() or 1)))
+GRACEFUL_SHUTDOWN_SECONDS = int(os.environ.get('GRACEFUL_SHUTDOWN_SECONDS', '30'))
+# Proxies uvicorn trusts to set X-Forwarded-For; the rate limiter also walks the
+# header itself, past RATE_LIMIT_TRUSTED_PROXIES
+FORWARDED_ALLOW_IPS = os.environ.get('FORWARDED_ALLOW_IPS', '127.0.0.1')
+# How long a worker keeps serving with readiness failing after SIGTERM
+SHUTDOWN_PRESTOP_SECONDS = float(os.environ.get('SHUTDOWN_PRESTOP_SECONDS', '5'))
+
+logger = logging.getLogger(__name__)
+
+_handle_exit = uvicorn.Server.handle_exit
+
+
+def handle_exit_after_prestop(self, sig, frame):
+    """Fail readiness as soon as the signal arrives and stop the server SHUTDOWN_PRESTOP_SECONDS later.
+
+    uvicorn runs the lifespan shutdown only after its listeners are closed, too
+    late for a load balancer to notice, so this has to hook the signal itself.
+    """
+    if server.worker_state['draining'] or SHUTDOWN_PRESTOP_SECONDS <= 0:
+        _handle_exit(self, sig, frame)
+        return
+    server.worker_state['ready'] = False
+    server.worker_state['draining'] = True
+    logger.info(f"Worker {os.getpid()} draining, stopping in {SHUTDOWN_PRESTOP_SECONDS}s")
+    timer = threading.Timer(SHUTDOWN_PRESTOP_SECONDS, _handle_exit, (self, sig, frame))
+    timer.daemon = True
+    timer.start()
+
+
+# Module level, so spawned worker processes, which re-import this file, install it too
+uvicorn.Server.handle_exit = handle_exit_after_prestop
+
+
+async def bootstrap():
+    server.open_repositories()
+    server.password_hasher.start()
+    try:
+        await server.bootstrap()
+    finally:
+        server.password_hasher.close()
+        await server.close_repositories()
+
+
+def main():
+    if server.REPOSITORY_BACKEND == "memory":
+        if WEB_CONCURRENCY > 1:
+            logger.error("REPOSITORY_BACKEND=memory keeps data per process; run it with WEB_CONCURRENCY=1")
+            return 1
+    elif server.BOOTSTRAP_ON_STARTUP:
+        asyncio.run(bootstrap())
+        # Inherited by worker processes; a single worker serves this already imported module
+        os.environ['BOOTSTRAP_ON_STARTUP'] = 'false'
+        server.BOOTSTRAP_ON_STARTUP = False
+
+    uvicorn.run(
+        "server:app",
+        app_dir=os.path.dirname(os.path.abspath(__file__)),
+        host=HOST,
+        port=PORT,
+        workers=WEB_CONCURRENCY,
+        lifespan="on",
+        proxy_headers=True,
+        forwarded_allow_ips=FORWARDED_ALLOW_IPS,
+        timeout_graceful_shutdown=GRACEFUL_SHUTDOWN_SECONDS
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
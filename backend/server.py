@@ -1,17 +1,47 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Query, Request, Response, UploadFile, File, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
+from starlette.routing import Match
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import IndexModel, UpdateOne, ReturnDocument, ASCENDING, DESCENDING
+from pymongo import monitoring
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure, PyMongoError
 import os
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field, ConfigDict, EmailStr
-from typing import List, Optional
+from pydantic import BaseModel, Field, ConfigDict, EmailStr, ValidationError
+from typing import Any, List, Optional
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
 import uuid
+import time
+import json
+import base64
+import csv
+import io
+import re
+import hashlib
+import hmac
+import ipaddress
+import threading
+import bisect
+import copy
+import math
+import operator
+from contextlib import asynccontextmanager
 from datetime import datetime, timezone, timedelta
+from zoneinfo import ZoneInfo
 import jwt
 import bcrypt
+import numpy as np
+
+try:
+    import orjson
+except ImportError:  # optional; FastJSONResponse falls back to the stdlib encoder
+    orjson = None
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -20,101 +50,2129 @@ load_dotenv(ROOT_DIR / '.env')
 SECRET_KEY = os.environ.get('JWT_SECRET_KEY', 'your-secret-key-change-in-production')
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7  # 7 days
+# Event stream tokens travel in the URL, so they only open /events/stream and expire quickly
+EVENT_STREAM_TOKEN_SECONDS = int(os.environ.get('EVENT_STREAM_TOKEN_SECONDS', '60'))
+
+# Authenticated user cache configuration
+USER_CACHE_MAX_SIZE = int(os.environ.get('USER_CACHE_MAX_SIZE', '10000'))
+USER_CACHE_TTL_SECONDS = float(os.environ.get('USER_CACHE_TTL_SECONDS', '60'))
+
+# Password hashing pool configuration
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', str(os.cpu_count() or 1)))
+PASSWORD_HASH_MAX_PENDING = int(os.environ.get('PASSWORD_HASH_MAX_PENDING', str(PASSWORD_HASH_WORKERS * 8)))
+
+# Real-time events: 'auto' uses MongoDB change streams when available, 'local' only in-process publishing
+EVENT_SOURCE = os.environ.get('EVENT_SOURCE', 'auto')
+EVENT_QUEUE_SIZE = int(os.environ.get('EVENT_QUEUE_SIZE', '100'))
+EVENT_HEARTBEAT_SECONDS = float(os.environ.get('EVENT_HEARTBEAT_SECONDS', '15'))
+
+# Public impact stats: in-process cache TTL and full reconciliation interval
+IMPACT_STATS_CACHE_TTL_SECONDS = float(os.environ.get('IMPACT_STATS_CACHE_TTL_SECONDS', '5'))
+IMPACT_STATS_RECONCILE_SECONDS = float(os.environ.get('IMPACT_STATS_RECONCILE_SECONDS', '3600'))
+
+# Conditional GET (ETag) cache: number of tracked responses, and how long a version
+# match is trusted before the handler runs again (guards against writes made by
+# other workers when change streams are unavailable)
+RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', '10000'))
+RESPONSE_CACHE_REVALIDATE_SECONDS = float(os.environ.get('RESPONSE_CACHE_REVALIDATE_SECONDS', '30'))
+
+# Fast response mode: list and single-item reads skip Pydantic response validation
+FAST_RESPONSES = os.environ.get('FAST_RESPONSES', 'false').lower() == 'true'
+
+# Idempotent data migrations (created_at -> BSON dates, GeoJSON backfill)
+RUN_MIGRATIONS_ON_STARTUP = os.environ.get('RUN_MIGRATIONS_ON_STARTUP', 'true').lower() == 'true'
+MIGRATION_BATCH_SIZE = int(os.environ.get('MIGRATION_BATCH_SIZE', '1000'))
+
+# Admin stats result cache (0 disables caching)
+ADMIN_STATS_CACHE_TTL_SECONDS = float(os.environ.get('ADMIN_STATS_CACHE_TTL_SECONDS', '0'))
+
+# Donation expiry: sweep interval, batch size, and the timezone assumed for expiry
+# dates entered without an offset (the dashboard sends local datetime-local values)
+EXPIRY_SWEEP_INTERVAL_SECONDS = float(os.environ.get('EXPIRY_SWEEP_INTERVAL_SECONDS', '60'))
+EXPIRY_SWEEP_BATCH_SIZE = int(os.environ.get('EXPIRY_SWEEP_BATCH_SIZE', '1000'))
+EXPIRY_TIMEZONE = ZoneInfo(os.environ.get('EXPIRY_TIMEZONE', 'UTC'))
+
+# Driver batch assignment: most orders per batch and how many nearby pending orders are considered
+ROUTE_MAX_ORDERS = int(os.environ.get('ROUTE_MAX_ORDERS', '10'))
+ROUTE_CANDIDATE_LIMIT = int(os.environ.get('ROUTE_CANDIDATE_LIMIT', '2000'))
+
+# Recipient matching: how often the in-memory candidate table is rebuilt and its row cap
+MATCH_TABLE_REFRESH_SECONDS = float(os.environ.get('MATCH_TABLE_REFRESH_SECONDS', '60'))
+MATCH_TABLE_MAX_ROWS = int(os.environ.get('MATCH_TABLE_MAX_ROWS', '200000'))
+
+# Maximum donations accepted by one bulk create request or upload
+BULK_DONATION_MAX_ITEMS = int(os.environ.get('BULK_DONATION_MAX_ITEMS', '1000'))
+
+# Status event log: events per insert_many, longest wait before a partial batch is
+# written, events held in memory while the database is unreachable, and how many
+# events one delivery-time analytics request reads
+STATUS_EVENT_BATCH_SIZE = int(os.environ.get('STATUS_EVENT_BATCH_SIZE', '500'))
+STATUS_EVENT_FLUSH_SECONDS = float(os.environ.get('STATUS_EVENT_FLUSH_SECONDS', '1'))
+STATUS_EVENT_MAX_BUFFERED = int(os.environ.get('STATUS_EVENT_MAX_BUFFERED', '100000'))
+STATUS_EVENT_ANALYTICS_MAX_EVENTS = int(os.environ.get('STATUS_EVENT_ANALYTICS_MAX_EVENTS', '200000'))
+
+# Rate limiting: token buckets per client IP, or per user on authenticated routes.
+# Each rate is "<requests>/<seconds>"; the bucket holds that many requests and
+# refills over the period. Buckets idle long enough to be full again are evicted
+# every RATE_LIMIT_EVICT_SECONDS, and at most RATE_LIMIT_MAX_KEYS are kept.
+# RATE_LIMIT_TRUSTED_PROXIES lists the networks whose X-Forwarded-For is believed
+# when finding the client address (by default loopback and private ranges, where
+# ingress controllers and load balancers live); "" trusts no proxy.
+RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+RATE_LIMIT_LOGIN = os.environ.get('RATE_LIMIT_LOGIN', '20/60')
+RATE_LIMIT_REGISTER = os.environ.get('RATE_LIMIT_REGISTER', '10/600')
+RATE_LIMIT_STATS = os.environ.get('RATE_LIMIT_STATS', '60/60')
+RATE_LIMIT_API = os.environ.get('RATE_LIMIT_API', '600/60')
+RATE_LIMIT_MAX_KEYS = int(os.environ.get('RATE_LIMIT_MAX_KEYS', '100000'))
+RATE_LIMIT_EVICT_SECONDS = float(os.environ.get('RATE_LIMIT_EVICT_SECONDS', '60'))
+RATE_LIMIT_TRUSTED_PROXIES = os.environ.get(
+    'RATE_LIMIT_TRUSTED_PROXIES',
+    '127.0.0.0/8,::1/128,10.0.0.0/8,172.16.0.0/12,192.168.0.0/16,fc00::/7'
+)
+
+# Number of documents fetched and written per chunk by the admin export endpoints
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', '500'))
+
+# Data access backend: "mongo", or "memory" to run the API hermetically (tests, benchmarks,
+# load tests) with per-process in-memory repositories
+REPOSITORY_BACKEND = os.environ.get('REPOSITORY_BACKEND', 'mongo')
 
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+DB_NAME = os.environ['DB_NAME']
+
+# MongoDB client tuning (unset values keep the driver defaults)
+MONGO_CLIENT_OPTIONS = {
+    "maxPoolSize": ('MONGO_MAX_POOL_SIZE', int),
+    "minPoolSize": ('MONGO_MIN_POOL_SIZE', int),
+    "maxIdleTimeMS": ('MONGO_MAX_IDLE_TIME_MS', int),
+    "maxConnecting": ('MONGO_MAX_CONNECTING', int),
+    "waitQueueTimeoutMS": ('MONGO_WAIT_QUEUE_TIMEOUT_MS', int),
+    "serverSelectionTimeoutMS": ('MONGO_SERVER_SELECTION_TIMEOUT_MS', int),
+    "connectTimeoutMS": ('MONGO_CONNECT_TIMEOUT_MS', int),
+    "socketTimeoutMS": ('MONGO_SOCKET_TIMEOUT_MS', int),
+    "compressors": ('MONGO_COMPRESSORS', str),  # e.g. "zstd,snappy,zlib"
+    "readPreference": ('MONGO_READ_PREFERENCE', str),  # e.g. "primaryPreferred"
+}
+MONGO_DRAIN_TIMEOUT_SECONDS = float(os.environ.get('MONGO_DRAIN_TIMEOUT_SECONDS', '10'))
+
+# Run the one-off bootstrap (indexes, migrations, admin account) in each worker's
+# startup; run.py runs it once and turns this off for its workers
+BOOTSTRAP_ON_STARTUP = os.environ.get('BOOTSTRAP_ON_STARTUP', 'true').lower() == 'true'
+
+# Prometheus scrape endpoint: bearer token required to read /api/metrics. Without
+# one the endpoint is disabled (404); admins can still read /api/admin/metrics
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+# Created per process by connect_mongo() during startup, so forked workers never share sockets
+client: Optional[AsyncIOMotorClient] = None
+db = None
+
+# Repositories for the configured backend, created by open_repositories() during startup
+repos = None
+
+# ============= METRICS =============
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(label_names: tuple, label_values: tuple) -> str:
+    if not label_names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape_label(value)}"' for name, value in zip(label_names, label_values)) + "}"
+
+class Counter:
+    """Prometheus counter with a fixed label set."""
+
+    def __init__(self, name: str, documentation: str, label_names: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, label_values: tuple = (), amount: float = 1) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for label_values, value in list(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.label_names, label_values)} {value}")
+        return lines
+
+class Histogram:
+    """Prometheus histogram with fixed buckets; observe() is a bisect plus two additions."""
+
+    def __init__(self, name: str, documentation: str, label_names: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, label_values: tuple = ()) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        bucket_names = self.label_names + ("le",)
+        for label_values, (counts, total, count) in list(self._series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{_format_labels(bucket_names, label_values + (le,))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, label_values)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, label_values)} {count}")
+        return lines
+
+http_requests_total = Counter("secondserve_http_requests_total", "HTTP requests by route and status.", ("method", "route", "status"))
+http_request_seconds = Histogram("secondserve_http_request_duration_seconds", "HTTP request latency by route.", ("method", "route"))
+mongo_command_seconds = Histogram("secondserve_mongo_command_duration_seconds", "MongoDB command latency by command.", ("command", "outcome"))
+password_hash_seconds = Histogram("secondserve_password_hash_duration_seconds", "bcrypt CPU time per operation.", ("operation",), buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 1.0, 2.0))
+password_queue_seconds = Histogram("secondserve_password_hash_queue_seconds", "Time bcrypt jobs wait for a worker.", ("operation",))
+route_planning_seconds = Histogram("secondserve_route_planning_duration_seconds", "CPU time spent selecting and ordering batch assignments.", ("stage",))
+rate_limited_total = Counter("secondserve_rate_limited_total", "Requests rejected by the rate limiter by policy.", ("policy",))
+serialization_seconds = Histogram("secondserve_serialization_duration_seconds", "Time spent encoding JSON response bodies.", ("encoder",), buckets=(0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25))
+METRICS = [http_requests_total, http_request_seconds, mongo_command_seconds, password_hash_seconds, password_queue_seconds, route_planning_seconds, rate_limited_total, serialization_seconds]
+
+class InstrumentedJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        started_at = time.perf_counter()
+        body = super().render(content)
+        serialization_seconds.observe(time.perf_counter() - started_at, ("json",))
+        return body
+
+def render_gauges(prefix: str, values: dict) -> List[str]:
+    """Expose the numeric entries of a component's stats() dict as gauges."""
+    lines = []
+    for key, value in values.items():
+        if isinstance(value, dict):
+            lines.extend(render_gauges(f"{prefix}_{key}", value))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            lines.append(f"# TYPE {prefix}_{key} gauge")
+            lines.append(f"{prefix}_{key} {value}")
+        elif isinstance(value, bool):
+            lines.append(f"# TYPE {prefix}_{key} gauge")
+            lines.append(f"{prefix}_{key} {int(value)}")
+    return lines
 
 # Create the main app without a prefix
-app = FastAPI()
+app = FastAPI(default_response_class=InstrumentedJSONResponse)
 
 # Create a router with the /api prefix
-api_router = APIRouter(prefix="/api")
+api_router = APIRouter(prefix="/api", default_response_class=InstrumentedJSONResponse)
 
 security = HTTPBearer()
 
-# ============= MODELS =============
+# ============= MONGO CLIENT =============
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    """Connection pool counters, including how long operations wait to check out a connection.
+
+    PyMongo raises checkout events synchronously on the thread running the
+    operation, so a thread-local start time pairs each checkout with its wait.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.connections_open = 0
+        self.checked_out = 0
+        self.waiting = 0
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.checkout_wait_seconds = 0.0
+        self.max_checkout_wait_seconds = 0.0
+        self.pool_clears = 0
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.pool_clears += 1
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        with self._lock:
+            self.connections_open += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.connections_open -= 1
+
+    def connection_check_out_started(self, event):
+        self._local.started_at = time.perf_counter()
+        with self._lock:
+            self.waiting += 1
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.waiting -= 1
+            self.checkout_failures += 1
+
+    def connection_checked_out(self, event):
+        started_at = getattr(self._local, 'started_at', None)
+        wait = time.perf_counter() - started_at if started_at is not None else 0.0
+        with self._lock:
+            self.waiting -= 1
+            self.checked_out += 1
+            self.checkouts += 1
+            self.checkout_wait_seconds += wait
+            self.max_checkout_wait_seconds = max(self.max_checkout_wait_seconds, wait)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out -= 1
+
+    def stats(self) -> dict:
+        return {
+            "connections_open": self.connections_open,
+            "checked_out": self.checked_out,
+            "waiting_for_connection": self.waiting,
+            "checkouts": self.checkouts,
+            "checkout_failures": self.checkout_failures,
+            "avg_checkout_wait_ms": round(self.checkout_wait_seconds / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+            "max_checkout_wait_ms": round(self.max_checkout_wait_seconds * 1000, 3),
+            "pool_clears": self.pool_clears
+        }
+
+class CommandMonitor(monitoring.CommandListener):
+    """Counts in-flight and completed MongoDB commands."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.commands_succeeded = 0
+        self.commands_failed = 0
+
+    def started(self, event):
+        with self._lock:
+            self.in_flight += 1
+
+    def succeeded(self, event):
+        with self._lock:
+            self.in_flight -= 1
+            self.commands_succeeded += 1
+        mongo_command_seconds.observe(event.duration_micros / 1e6, (event.command_name, "success"))
+
+    def failed(self, event):
+        with self._lock:
+            self.in_flight -= 1
+            self.commands_failed += 1
+        mongo_command_seconds.observe(event.duration_micros / 1e6, (event.command_name, "failure"))
+
+    def stats(self) -> dict:
+        return {"in_flight": self.in_flight, "succeeded": self.commands_succeeded, "failed": self.commands_failed}
+
+pool_monitor = PoolMonitor()
+command_monitor = CommandMonitor()
+
+def mongo_client_options() -> dict:
+    options = {"tz_aware": True, "event_listeners": [pool_monitor, command_monitor]}
+    for option, (env_name, cast) in MONGO_CLIENT_OPTIONS.items():
+        value = os.environ.get(env_name)
+        if value:
+            options[option] = cast(value)
+    return options
+
+def connect_mongo() -> None:
+    """Create this process's Motor client; a no-op if one already exists."""
+    global client, db
+    if client is not None:
+        return
+    client = AsyncIOMotorClient(mongo_url, **mongo_client_options())
+    db = client[DB_NAME]
+
+async def close_mongo() -> None:
+    """Wait (bounded) for in-flight commands to finish, then close the pool."""
+    global client, db
+    if client is None:
+        return
+    deadline = time.monotonic() + MONGO_DRAIN_TIMEOUT_SECONDS
+    while command_monitor.in_flight > 0 and time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+    client.close()
+    client = None
+    db = None
+
+# ============= MODELS =============
+
+class UserRole(BaseModel):
+    role: str  # 'donor', 'recipient', 'driver'
+
+class User(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    email: str
+    name: str
+    role: str  # 'donor', 'recipient', 'driver'
+    phone: Optional[str] = None
+    location: Optional[dict] = None
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+class UserRegister(BaseModel):
+    email: EmailStr
+    password: str
+    name: str
+    role: str
+    phone: Optional[str] = None
+
+class UserLogin(BaseModel):
+    email: EmailStr
+    password: str
+
+class Token(BaseModel):
+    access_token: str
+    token_type: str
+    user: User
+
+class Donation(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    donor_id: str
+    donor_name: str
+    food_type: str
+    quantity: str
+    prepared_at: Optional[str] = None  # prepared date and time (optional for backward compatibility)
+    expiry_date: str  # expiry date and time
+    description: Optional[str] = None
+    photo_url: Optional[str] = None
+    location: dict
+    dietary_tags: Optional[List[str]] = None  # e.g. Vegetarian, Vegan, Halal; see DIETARY_TAGS
+    status: str = "available"  # available, claimed, picked_up, delivered, expired
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+class NearbyDonation(Donation):
+    distance_km: float
+
+class DonationMatch(Donation):
+    score: float
+    distance_km: Optional[float] = None
+
+class DonationCreate(BaseModel):
+    food_type: str
+    quantity: str
+    prepared_at: str
+    expiry_date: str
+    description: Optional[str] = None
+    photo_url: Optional[str] = None
+    location: dict
+    dietary_tags: Optional[List[str]] = None
+
+class Order(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    donation_id: str
+    recipient_id: str
+    recipient_name: str
+    donor_id: str
+    driver_id: Optional[str] = None
+    driver_name: Optional[str] = None
+    status: str = "pending"  # pending, assigned, in_transit, delivered, cancelled
+    dietary_preferences: Optional[List[str]] = None
+    pickup_location: dict
+    delivery_location: dict
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    estimated_delivery: Optional[str] = None
+
+class BulkItemResult(BaseModel):
+    index: int
+    status: str  # 'created' or 'error'
+    id: Optional[str] = None
+    errors: Optional[List[str]] = None
+
+class BulkDonationResult(BaseModel):
+    created: int
+    failed: int
+    results: List[BulkItemResult]
+
+class NearbyOrder(Order):
+    distance_km: float
+
+class BatchAssignRequest(BaseModel):
+    lat: float = Field(..., ge=-90, le=90)
+    lng: float = Field(..., ge=-180, le=180)
+    max_orders: int = Field(5, ge=1, le=ROUTE_MAX_ORDERS)
+    radius_km: float = Field(10, gt=0, le=200)
+
+class RouteStop(BaseModel):
+    order_id: str
+    kind: str  # 'pickup' or 'delivery'
+    location: dict
+
+class RoutePlan(BaseModel):
+    orders: List[Order]
+    stops: List[RouteStop]
+    distance_km: float
+
+class OrderCreate(BaseModel):
+    donation_id: str
+    dietary_preferences: Optional[List[str]] = None
+    delivery_location: dict
+
+class ImpactStats(BaseModel):
+    total_meals: int
+    active_donors: int
+    communities_served: int
+    co2_saved: float
+
+# ============= INDEXES =============
+
+# Each index mirrors the filter + sort of the route(s) that use it.
+INDEX_REGISTRY = {
+    "users": [
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),  # register, login
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),  # get_current_user
+        IndexModel([("role", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="role_created_at_id"),  # admin users, stats
+    ],
+    "donations": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),  # get_donation, create_order
+        IndexModel([("status", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="status_created_at_id"),  # available listings
+        IndexModel([("donor_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="donor_created_at_id"),  # donor listings
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)], name="created_at_id"),  # admin donations
+        IndexModel([("geo", "2dsphere"), ("status", ASCENDING)], name="geo_status"),  # /donations/nearby
+        IndexModel([("status", ASCENDING), ("expires_at", ASCENDING)], name="status_expires_at"),  # expiry sweeper
+    ],
+    "orders": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),  # assign, status updates
+        IndexModel([("recipient_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="recipient_created_at_id"),
+        IndexModel([("donor_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="donor_created_at_id"),
+        IndexModel([("driver_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="driver_created_at_id"),
+        IndexModel([("status", ASCENDING), ("driver_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="status_driver_created_at_id"),  # /orders/available
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)], name="created_at_id"),  # admin orders
+        IndexModel([("pickup_geo", "2dsphere"), ("status", ASCENDING)], name="pickup_geo_status"),  # /orders/available/nearby
+    ],
+    "status_events": [
+        IndexModel([("entity_id", ASCENDING), ("created_at", ASCENDING)], name="entity_created_at"),  # per order/donation history
+        IndexModel([("kind", ASCENDING), ("created_at", DESCENDING)], name="kind_created_at"),  # delivery-time analytics
+    ],
+}
+
+async def ensure_indexes() -> None:
+    """Create every registered index; existing identical indexes are a no-op."""
+    for collection_name, indexes in INDEX_REGISTRY.items():
+        for index in indexes:
+            try:
+                await db[collection_name].create_indexes([index])
+            except OperationFailure as e:
+                logger.error(f"Failed to create index {collection_name}.{index.document['name']}: {e}")
+
+async def index_report() -> dict:
+    """Compare registered indexes against the database and flag missing or unused ones."""
+    report = {}
+    for collection_name, indexes in INDEX_REGISTRY.items():
+        collection = db[collection_name]
+        existing = await collection.index_information()
+        declared = [index.document['name'] for index in indexes]
+        
+        usage = {}
+        try:
+            async for index_stats in collection.aggregate([{"$indexStats": {}}]):
+                usage[index_stats['name']] = index_stats['accesses']['ops']
+        except OperationFailure:
+            pass
+        
+        report[collection_name] = {
+            "missing": [name for name in declared if name not in existing],
+            "unregistered": [name for name in existing if name != "_id_" and name not in declared],
+            "unused": [name for name, ops in usage.items() if ops == 0 and name != "_id_"],
+            "usage": usage
+        }
+    return report
+
+# ============= PAGINATION =============
+
+PAGE_SORT = [("created_at", DESCENDING), ("id", DESCENDING)]
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def encode_cursor(doc: dict) -> str:
+    payload = json.dumps({"created_at": doc['created_at'].isoformat(), "id": doc['id']}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor: str) -> dict:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return {"created_at": datetime.fromisoformat(payload['created_at']), "id": payload['id']}
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+async def fetch_page(repository, query: dict, projection: dict, limit: int, cursor: Optional[str], response: Response) -> list:
+    """Return one page ordered newest first, keyed on (created_at, id).
+
+    When more documents remain, the cursor for the next page is sent in the
+    ``X-Next-Cursor`` response header; pass it back as ``cursor`` to continue.
+    """
+    after = decode_cursor(cursor) if cursor else None
+    docs = await repository.page(query, projection, limit + 1, after)
+    if len(docs) > limit:
+        docs = docs[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(docs[-1])
+    return docs
+
+# ============= GEO =============
+
+def geo_point(location: Optional[dict]) -> Optional[dict]:
+    """GeoJSON point for a ``{"lat", "lng"}`` location, or None when it has no usable coordinates."""
+    if not location:
+        return None
+    try:
+        lat = float(location['lat'])
+        lng = float(location['lng'])
+    except (KeyError, TypeError, ValueError):
+        return None
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180) or (lat == 0 and lng == 0):
+        return None
+    return {"type": "Point", "coordinates": [lng, lat]}
+
+async def geo_near(repository, key: str, lat: float, lng: float, radius_km: float, query: dict, limit: int) -> list:
+    docs = await repository.near(key, lat, lng, radius_km, query, limit)
+    for doc in docs:
+        doc['distance_km'] = round(doc['distance_km'], 3)
+    return docs
+
+# ============= REPOSITORIES =============
+
+# Data access for users, donations and orders goes through one repository per
+# collection. MongoRepository wraps Motor; MemoryRepository keeps documents in
+# process with the same query semantics, so the API and its load tests can run
+# without a database and handler cost can be measured apart from Mongo latency.
+# Queries use the subset of MongoDB filter syntax the routes need; updates are
+# plain field -> value changes applied with $set.
+
+EARTH_RADIUS_METERS = 6378100  # radius MongoDB uses for 2dsphere distances
+
+class MongoRepository:
+    """Data access for one collection through Motor."""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def get(self, query: dict, projection: Optional[dict] = None) -> Optional[dict]:
+        return await self.collection.find_one(query, projection or {"_id": 0})
+
+    async def exists(self, query: dict) -> bool:
+        return await self.collection.find_one(query, {"_id": 1}) is not None
+
+    async def find(self, query: dict, projection: dict, limit: int) -> list:
+        return await self.collection.find(query, projection).limit(limit).to_list(limit)
+
+    async def page(self, query: dict, projection: dict, limit: int, after: Optional[dict] = None) -> list:
+        """Up to ``limit`` documents newest first, starting after the (created_at, id) position ``after``."""
+        if after:
+            query = {
+                "$and": [
+                    query,
+                    {"$or": [
+                        {"created_at": {"$lt": after['created_at']}},
+                        {"created_at": after['created_at'], "id": {"$lt": after['id']}}
+                    ]}
+                ]
+            }
+        return await self.collection.find(query, projection).sort(PAGE_SORT).limit(limit).to_list(limit)
+
+    async def iterate(self, query: dict, projection: dict, batch_size: int):
+        async for doc in self.collection.find(query, projection).sort(PAGE_SORT).batch_size(batch_size):
+            yield doc
+
+    async def near(self, key: str, lat: float, lng: float, radius_km: float, query: dict, limit: int) -> list:
+        """Documents within ``radius_km`` of a point, nearest first, with ``distance_km`` set."""
+        return await self.collection.aggregate([
+            {"$geoNear": {
+                "near": {"type": "Point", "coordinates": [lng, lat]},
+                "key": key,
+                "distanceField": "distance_km",
+                "distanceMultiplier": 0.001,
+                "maxDistance": radius_km * 1000,
+                "query": query,
+                "spherical": True
+            }},
+            {"$limit": limit},
+            {"$project": {"_id": 0}}
+        ]).to_list(limit)
+
+    async def count(self, query: dict) -> int:
+        return await self.collection.count_documents(query)
+
+    async def count_by(self, field: str) -> dict:
+        """Count documents grouped by ``field`` in a single aggregation pass."""
+        counts = {}
+        async for bucket in self.collection.aggregate([{"$group": {"_id": f"${field}", "count": {"$sum": 1}}}]):
+            counts[bucket['_id']] = bucket['count']
+        return counts
+
+    async def distinct(self, field: str, query: dict) -> list:
+        return await self.collection.distinct(field, query)
+
+    async def insert(self, doc: dict) -> None:
+        await self.collection.insert_one(doc)
+
+    async def insert_if_absent(self, query: dict, doc: dict) -> bool:
+        """Insert ``doc`` unless a document matches ``query``, in one upsert; True if it was inserted."""
+        try:
+            result = await self.collection.update_one(query, {"$setOnInsert": doc}, upsert=True)
+        except DuplicateKeyError:
+            # Concurrent upserts racing on a unique index: another caller inserted first
+            return False
+        return result.upserted_id is not None
+
+    async def insert_many(self, docs: list) -> dict:
+        """Insert every document it can; returns ``{position: error message}`` for the ones that failed."""
+        try:
+            await self.collection.insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            return {error['index']: error['errmsg'] for error in e.details.get('writeErrors', [])}
+        return {}
+
+    async def update(self, query: dict, changes: dict) -> bool:
+        """Apply ``changes`` to the first matching document; True if it was modified."""
+        result = await self.collection.update_one(query, {"$set": changes})
+        return result.modified_count > 0
+
+    async def update_many(self, query: dict, changes: dict) -> int:
+        result = await self.collection.update_many(query, {"$set": changes})
+        return result.modified_count
+
+    async def find_and_update(self, query: dict, changes: dict, projection: Optional[dict] = None, original: bool = False) -> Optional[dict]:
+        """Atomically apply ``changes`` to the first matching document and return it as updated,
+        or as it was before the update when ``original`` is set."""
+        return await self.collection.find_one_and_update(
+            query,
+            {"$set": changes},
+            projection=projection or {"_id": 0},
+            return_document=ReturnDocument.BEFORE if original else ReturnDocument.AFTER
+        )
+
+class MongoImpactRepository:
+    """Materialized impact counters and the set of communities served."""
+
+    def __init__(self, database):
+        self.stats = database.impact_stats
+        self.communities = database.impact_communities
+
+    async def get(self) -> Optional[dict]:
+        return await self.stats.find_one({"_id": IMPACT_STATS_ID})
+
+    async def increment(self, deltas: dict) -> None:
+        await self.stats.update_one({"_id": IMPACT_STATS_ID}, {"$inc": deltas}, upsert=True)
+
+    async def replace(self, stats: dict) -> None:
+        await self.stats.update_one({"_id": IMPACT_STATS_ID}, {"$set": stats}, upsert=True)
+
+    async def add_community(self, city: str) -> bool:
+        """Record ``city``; True if it had not been served before."""
+        result = await self.communities.update_one({"_id": city}, {"$setOnInsert": {"city": city}}, upsert=True)
+        return result.upserted_id is not None
+
+    async def set_communities(self, cities: set) -> None:
+        if cities:
+            await self.communities.bulk_write(
+                [UpdateOne({"_id": city}, {"$setOnInsert": {"city": city}}, upsert=True) for city in cities],
+                ordered=False
+            )
+        await self.communities.delete_many({"_id": {"$nin": list(cities)}})
+
+_MISSING = object()
+
+_COMPARISONS = {"$lt": operator.lt, "$lte": operator.le, "$gt": operator.gt, "$gte": operator.ge}
+
+def _field_value(doc: dict, path: str):
+    value = doc
+    for part in path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return _MISSING
+        value = value[part]
+    return value
+
+def _matches_operator(value, op: str, operand) -> bool:
+    if op == "$exists":
+        return (value is not _MISSING) == bool(operand)
+    if op == "$not":
+        return not all(_matches_operator(value, inner_op, inner) for inner_op, inner in operand.items())
+    if value is _MISSING:
+        value = None
+    if op == "$eq":
+        return value == operand
+    if op == "$ne":
+        return value != operand
+    if op == "$in":
+        return value in operand
+    if op == "$nin":
+        return value not in operand
+    if op in _COMPARISONS:
+        # Like MongoDB, ordering comparisons only match values of a comparable type
+        if value is None or operand is None:
+            return False
+        try:
+            return _COMPARISONS[op](value, operand)
+        except TypeError:
+            return False
+    raise ValueError(f"Unsupported query operator {op}")
+
+def matches_query(doc: dict, query: dict) -> bool:
+    """Evaluate a MongoDB filter (the subset the routes use) against a document."""
+    for key, condition in query.items():
+        if key == "$and":
+            if not all(matches_query(doc, clause) for clause in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_query(doc, clause) for clause in condition):
+                return False
+        elif isinstance(condition, dict) and condition and all(op.startswith("$") for op in condition):
+            value = _field_value(doc, key)
+            if not all(_matches_operator(value, op, operand) for op, operand in condition.items()):
+                return False
+        elif not _matches_operator(_field_value(doc, key), "$eq", condition):
+            return False
+    return True
+
+def _copy_value(value):
+    return copy.deepcopy(value) if isinstance(value, (dict, list)) else value
+
+def project(doc: dict, projection: Optional[dict]) -> dict:
+    """Copy of ``doc`` shaped by an inclusion or exclusion projection."""
+    if projection is None:
+        return {field: _copy_value(value) for field, value in doc.items()}
+    included = [field for field, flag in projection.items() if flag and field != "_id"]
+    if included:
+        return {field: _copy_value(doc[field]) for field in included if field in doc}
+    excluded = {field for field, flag in projection.items() if not flag}
+    return {field: _copy_value(value) for field, value in doc.items() if field not in excluded}
+
+def haversine_meters(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lng2 - lng1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_METERS * math.asin(min(1.0, math.sqrt(a)))
+
+class MemoryRepository:
+    """In-process counterpart of MongoRepository with the same semantics and indexes.
+
+    Documents are kept by ``id``. Every registered index contributes a hash index
+    on its leading field whose buckets hold (created_at, id) keys in sort order,
+    mirroring the compound indexes the routes use, so point lookups and pages
+    walk an index instead of scanning the collection. Unique indexes raise
+    DuplicateKeyError like MongoDB. Geo queries have no spatial index and scan
+    the candidate bucket. No method awaits, so each one is atomic on the event loop.
+    """
+
+    def __init__(self, name: str, unique_fields: List[str], indexed_fields: List[str]):
+        self.name = name
+        self._docs = {}
+        self._unique = {field: {} for field in unique_fields}
+        self._indexes = {field: {} for field in indexed_fields}
+        self._order = []
+
+    @staticmethod
+    def _key(doc: dict) -> tuple:
+        return (doc.get('created_at'), doc['id'])
+
+    def _check_unique(self, doc: dict, doc_id: Optional[str] = None) -> None:
+        for field, index in self._unique.items():
+            owner = index.get(doc.get(field))
+            if owner is not None and owner != doc_id:
+                raise DuplicateKeyError(
+                    f"E11000 duplicate key error collection: {self.name} index: {field}_unique dup key: {{ {field}: {doc.get(field)!r} }}",
+                    11000
+                )
+
+    def _add(self, doc: dict) -> None:
+        key = self._key(doc)
+        for field, index in self._unique.items():
+            if doc.get(field) is not None:
+                index[doc[field]] = doc['id']
+        for field, index in self._indexes.items():
+            bisect.insort(index.setdefault(doc.get(field), []), key)
+        bisect.insort(self._order, key)
+
+    def _remove(self, doc: dict) -> None:
+        key = self._key(doc)
+        for field, index in self._unique.items():
+            index.pop(doc.get(field), None)
+        for field, index in self._indexes.items():
+            bucket = index[doc.get(field)]
+            del bucket[bisect.bisect_left(bucket, key)]
+            if not bucket:
+                del index[doc.get(field)]
+        del self._order[bisect.bisect_left(self._order, key)]
+
+    def _keys(self, query: dict) -> list:
+        """Sorted (created_at, id) keys of the smallest index bucket the query pins down."""
+        best = self._order
+        for field, condition in query.items():
+            if field in self._unique and isinstance(condition, dict) and list(condition) == ["$in"]:
+                doc_ids = {self._unique[field].get(value) for value in condition['$in']} - {None}
+                return sorted(self._key(self._docs[doc_id]) for doc_id in doc_ids)
+            if isinstance(condition, dict) and not ("$eq" in condition and len(condition) == 1):
+                continue
+            value = condition['$eq'] if isinstance(condition, dict) else condition
+            if field in self._unique:
+                doc_id = self._unique[field].get(value)
+                return [self._key(self._docs[doc_id])] if doc_id is not None else []
+            if field in self._indexes:
+                bucket = self._indexes[field].get(value, [])
+                if len(bucket) < len(best):
+                    best = bucket
+        return best
+
+    def _scan(self, query: dict, after: Optional[dict] = None):
+        """Matching documents newest first, starting after the (created_at, id) position ``after``."""
+        keys = self._keys(query)
+        end = bisect.bisect_left(keys, (after['created_at'], after['id'])) if after else len(keys)
+        for position in range(end - 1, -1, -1):
+            doc = self._docs[keys[position][1]]
+            if matches_query(doc, query):
+                yield doc
+
+    def _first(self, query: dict) -> Optional[dict]:
+        return next(self._scan(query), None)
+
+    def _apply(self, doc: dict, changes: dict) -> bool:
+        if all(doc.get(field, _MISSING) == value for field, value in changes.items()):
+            return False
+        self._check_unique({**doc, **changes}, doc['id'])
+        self._remove(doc)
+        doc.update({field: _copy_value(value) for field, value in changes.items()})
+        self._add(doc)
+        return True
+
+    async def get(self, query: dict, projection: Optional[dict] = None) -> Optional[dict]:
+        doc = self._first(query)
+        return project(doc, projection or {"_id": 0}) if doc is not None else None
+
+    async def exists(self, query: dict) -> bool:
+        return self._first(query) is not None
+
+    async def find(self, query: dict, projection: dict, limit: int) -> list:
+        docs = []
+        for doc in self._scan(query):
+            docs.append(project(doc, projection))
+            if len(docs) == limit:
+                break
+        return docs
+
+    async def page(self, query: dict, projection: dict, limit: int, after: Optional[dict] = None) -> list:
+        docs = []
+        for doc in self._scan(query, after):
+            docs.append(project(doc, projection))
+            if len(docs) == limit:
+                break
+        return docs
+
+    async def iterate(self, query: dict, projection: dict, batch_size: int):
+        for count, doc in enumerate(self._scan(query), start=1):
+            yield project(doc, projection)
+            if count % batch_size == 0:
+                await asyncio.sleep(0)
+
+    async def near(self, key: str, lat: float, lng: float, radius_km: float, query: dict, limit: int) -> list:
+        found = []
+        for doc in self._scan(query):
+            point = doc.get(key)
+            if not point:
+                continue
+            point_lng, point_lat = point['coordinates']
+            distance = haversine_meters(lat, lng, point_lat, point_lng)
+            if distance <= radius_km * 1000:
+                found.append((distance, doc))
+        found.sort(key=lambda item: item[0])
+        return [{**project(doc, {"_id": 0}), "distance_km": distance * 0.001} for distance, doc in found[:limit]]
+
+    async def count(self, query: dict) -> int:
+        return sum(1 for _ in self._scan(query))
+
+    async def count_by(self, field: str) -> dict:
+        if field in self._indexes:
+            return {value: len(keys) for value, keys in self._indexes[field].items()}
+        counts = {}
+        for doc in self._docs.values():
+            counts[doc.get(field)] = counts.get(doc.get(field), 0) + 1
+        return counts
+
+    async def distinct(self, field: str, query: dict) -> list:
+        values = []
+        for doc in self._scan(query):
+            value = _field_value(doc, field)
+            if value is not _MISSING and value not in values:
+                values.append(value)
+        return values
+
+    async def insert(self, doc: dict) -> None:
+        self._check_unique(doc)
+        self._add_doc(doc)
+
+    async def insert_if_absent(self, query: dict, doc: dict) -> bool:
+        if self._first(query) is not None:
+            return False
+        self._check_unique(doc)
+        self._add_doc(doc)
+        return True
+
+    def _add_doc(self, doc: dict) -> None:
+        stored = project(doc, {"_id": 0})
+        self._docs[stored['id']] = stored
+        self._add(stored)
+
+    async def insert_many(self, docs: list) -> dict:
+        errors = {}
+        for position, doc in enumerate(docs):
+            try:
+                self._check_unique(doc)
+            except DuplicateKeyError as e:
+                errors[position] = str(e)
+                continue
+            self._add_doc(doc)
+        return errors
+
+    async def update(self, query: dict, changes: dict) -> bool:
+        doc = self._first(query)
+        return doc is not None and self._apply(doc, changes)
+
+    async def update_many(self, query: dict, changes: dict) -> int:
+        return sum(1 for doc in list(self._scan(query)) if self._apply(doc, changes))
+
+    async def find_and_update(self, query: dict, changes: dict, projection: Optional[dict] = None, original: bool = False) -> Optional[dict]:
+        doc = self._first(query)
+        if doc is None:
+            return None
+        before = project(doc, projection or {"_id": 0}) if original else None
+        self._apply(doc, changes)
+        return before if original else project(doc, projection or {"_id": 0})
+
+class MemoryImpactRepository:
+    def __init__(self):
+        self._stats = None
+        self._communities = set()
+
+    async def get(self) -> Optional[dict]:
+        return dict(self._stats) if self._stats is not None else None
+
+    async def increment(self, deltas: dict) -> None:
+        stats = self._stats if self._stats is not None else {}
+        for field, delta in deltas.items():
+            stats[field] = stats.get(field, 0) + delta
+        self._stats = stats
+
+    async def replace(self, stats: dict) -> None:
+        self._stats = {**(self._stats or {}), **stats}
+
+    async def add_community(self, city: str) -> bool:
+        if city in self._communities:
+            return False
+        self._communities.add(city)
+        return True
+
+    async def set_communities(self, cities: set) -> None:
+        self._communities = set(cities)
+
+class Repositories:
+    def __init__(self, users, donations, orders, status_events, impact):
+        self.users = users
+        self.donations = donations
+        self.orders = orders
+        self.status_events = status_events
+        self.impact = impact
+
+def mongo_repositories(database) -> Repositories:
+    return Repositories(
+        users=MongoRepository(database.users),
+        donations=MongoRepository(database.donations),
+        orders=MongoRepository(database.orders),
+        status_events=MongoRepository(database.status_events),
+        impact=MongoImpactRepository(database)
+    )
+
+def memory_repository(collection_name: str) -> MemoryRepository:
+    """In-memory repository indexed on the leading field of each registered index."""
+    unique_fields, indexed_fields = [], []
+    for index in INDEX_REGISTRY[collection_name]:
+        field, direction = next(iter(index.document['key'].items()))
+        if direction == "2dsphere" or field == "created_at":
+            continue
+        fields = unique_fields if index.document.get('unique') else indexed_fields
+        if field not in fields:
+            fields.append(field)
+    return MemoryRepository(collection_name, unique_fields, indexed_fields)
+
+def memory_repositories() -> Repositories:
+    return Repositories(
+        users=memory_repository("users"),
+        donations=memory_repository("donations"),
+        orders=memory_repository("orders"),
+        status_events=memory_repository("status_events"),
+        impact=MemoryImpactRepository()
+    )
+
+def open_repositories() -> None:
+    """Create this process's repositories for REPOSITORY_BACKEND; a no-op if they already exist."""
+    global repos
+    if repos is not None:
+        return
+    if REPOSITORY_BACKEND == "memory":
+        repos = memory_repositories()
+    else:
+        connect_mongo()
+        repos = mongo_repositories(db)
+
+async def close_repositories() -> None:
+    global repos
+    repos = None
+    await close_mongo()
+
+# ============= ROUTE PLANNING =============
+
+# Batch assignment picks a driver's orders by walking nearest pickups and then
+# orders the trip as all pickups followed by all deliveries, so every pickup
+# precedes its delivery. Both legs are nearest-neighbour paths tightened with
+# 2-opt; distances are computed as NumPy great-circle vectors and matrices.
+
+EARTH_RADIUS_KM = EARTH_RADIUS_METERS / 1000
+
+def distances_from_km(origin: np.ndarray, points: np.ndarray) -> np.ndarray:
+    """Great-circle distances from one (lat, lng) to an (n, 2) array of (lat, lng), in degrees."""
+    lat1, lng1 = np.radians(origin)
+    lat2, lng2 = np.radians(points[:, 0]), np.radians(points[:, 1])
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+def distance_matrix_km(points: np.ndarray) -> np.ndarray:
+    """Pairwise great-circle distances for an (n, 2) array of (lat, lng) in degrees."""
+    lat = np.radians(points[:, 0])[:, None]
+    lng = np.radians(points[:, 1])[:, None]
+    a = np.sin((lat - lat.T) / 2) ** 2 + np.cos(lat) * np.cos(lat.T) * np.sin((lng - lng.T) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+def nearest_neighbour_walk(origin: tuple, points: np.ndarray):
+    """Yield indices of ``points`` in nearest-neighbour order, each step starting from the last point yielded."""
+    remaining = np.ones(len(points), dtype=bool)
+    position = np.array(origin, dtype=float)
+    for _ in range(len(points)):
+        distances = np.where(remaining, distances_from_km(position, points), np.inf)
+        index = int(np.argmin(distances))
+        remaining[index] = False
+        position = points[index]
+        yield index
+
+def path_length_km(path: List[int], distances: np.ndarray) -> float:
+    return float(distances[path[:-1], path[1:]].sum()) if len(path) > 1 else 0.0
+
+def two_opt(path: List[int], distances: np.ndarray, max_passes: int = 50) -> List[int]:
+    """Shorten an open path by reversing segments; the first node stays fixed.
+
+    For each segment start ``i`` the gain of every possible segment end is
+    evaluated at once from the distance matrix and the best reversal is applied.
+    """
+    path = np.array(path)
+    n = len(path)
+    for _ in range(max_passes):
+        improved = False
+        for i in range(1, n - 1):
+            ends = np.arange(i + 1, n)
+            before, first, lasts = path[i - 1], path[i], path[ends]
+            gain = distances[before, lasts] - distances[before, first]
+            inner = ends < n - 1
+            after = path[ends[inner] + 1]
+            gain[inner] += distances[first, after] - distances[lasts[inner], after]
+            best = int(np.argmin(gain))
+            if gain[best] < -1e-9:
+                path[i:ends[best] + 1] = path[i:ends[best] + 1][::-1].copy()
+                improved = True
+        if not improved:
+            break
+    return path.tolist()
+
+def plan_leg(distances: np.ndarray, start: int, nodes: List[int]) -> List[int]:
+    """Nearest-neighbour path from ``start`` through ``nodes``, improved with 2-opt (start excluded)."""
+    if not nodes:
+        return []
+    path = [start]
+    remaining = list(nodes)
+    while remaining:
+        row = distances[path[-1], remaining]
+        path.append(remaining.pop(int(np.argmin(row))))
+    return two_opt(path, distances)[1:]
+
+def geo_lat_lng(point: Optional[dict]) -> Optional[tuple]:
+    if not point:
+        return None
+    lng, lat = point['coordinates']
+    return (lat, lng)
+
+def plan_route(origin: tuple, orders: List[dict]) -> tuple:
+    """Order pickups then deliveries for ``orders``; returns (stops, distance_km).
+
+    Orders whose delivery location has no coordinates are delivered last, in
+    pickup order, and that final stretch is not counted in the distance.
+    """
+    deliveries = [geo_lat_lng(order.get('delivery_geo')) for order in orders]
+    routable = [index for index, point in enumerate(deliveries) if point is not None]
+    
+    # Node 0 is the driver, nodes 1..n the pickups, then one node per routable delivery
+    points = np.array(
+        [origin] + [geo_lat_lng(order['pickup_geo']) for order in orders] + [deliveries[index] for index in routable],
+        dtype=float
+    )
+    distances = distance_matrix_km(points)
+    pickup_path = plan_leg(distances, 0, list(range(1, len(orders) + 1)))
+    delivery_path = plan_leg(distances, pickup_path[-1], list(range(len(orders) + 1, len(points)))) if pickup_path else []
+    
+    pickup_order = [node - 1 for node in pickup_path]
+    delivery_order = [routable[node - len(orders) - 1] for node in delivery_path]
+    delivery_order += [index for index in pickup_order if deliveries[index] is None]
+    
+    stops = [{"order_id": orders[index]['id'], "kind": "pickup", "location": orders[index]['pickup_location']} for index in pickup_order]
+    stops += [{"order_id": orders[index]['id'], "kind": "delivery", "location": orders[index]['delivery_location']} for index in delivery_order]
+    return stops, round(path_length_km([0] + pickup_path + delivery_path, distances), 3)
+
+# ============= FAST RESPONSES =============
+
+class ResponseShape:
+    """Projection and defaults derived once from a response model.
+
+    Documents fetched with ``projection`` already carry exactly the model's fields
+    (they were written from the same model), so in fast mode they are only padded
+    with defaults for optional fields missing on older documents and then encoded
+    straight to JSON, instead of being validated twice by Pydantic.
+    """
+
+    def __init__(self, model):
+        self.fields = list(model.model_fields)
+        self.projection = {"_id": 0, **{field: 1 for field in self.fields}}
+        self.defaults = {
+            name: field.default
+            for name, field in model.model_fields.items()
+            if not field.is_required() and field.default_factory is None
+        }
+
+    def shape(self, doc: dict) -> dict:
+        if len(doc) == len(self.fields):
+            return doc
+        return {**self.defaults, **doc}
+
+DONATION_SHAPE = ResponseShape(Donation)
+ORDER_SHAPE = ResponseShape(Order)
+USER_SHAPE = ResponseShape(User)
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def dump_json(content) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_UTC_Z)
+    return json.dumps(content, default=_json_default, separators=(",", ":")).encode('utf-8')
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        started_at = time.perf_counter()
+        body = dump_json(content)
+        serialization_seconds.observe(time.perf_counter() - started_at, ("fast",))
+        return body
+
+def fast_response(content, shape: ResponseShape, response: Optional[Response] = None):
+    """Return ``content`` for normal response_model handling, or pre-encoded JSON in fast mode."""
+    if not FAST_RESPONSES:
+        return content
+    if isinstance(content, list):
+        body = [shape.shape(doc) for doc in content]
+    else:
+        body = shape.shape(content)
+    fast = FastJSONResponse(body)
+    if response is not None and NEXT_CURSOR_HEADER in response.headers:
+        fast.headers[NEXT_CURSOR_HEADER] = response.headers[NEXT_CURSOR_HEADER]
+    return fast
+
+# ============= MIGRATIONS =============
+
+async def migrate_created_at(collection, batch_size: int = MIGRATION_BATCH_SIZE) -> int:
+    """Convert legacy ISO-string ``created_at`` values to BSON dates.
+
+    Only documents still holding a string are touched, so the migration is
+    idempotent and safe to run from several processes at once.
+    """
+    migrated = 0
+    last_id = None
+    while True:
+        query = {"created_at": {"$type": "string"}}
+        if last_id is not None:
+            query['_id'] = {"$gt": last_id}
+        docs = await collection.find(query, {"_id": 1, "created_at": 1}).sort("_id", ASCENDING).limit(batch_size).to_list(batch_size)
+        if not docs:
+            return migrated
+        last_id = docs[-1]['_id']
+        
+        updates = []
+        for doc in docs:
+            try:
+                created_at = datetime.fromisoformat(doc['created_at'])
+            except ValueError:
+                logger.warning(f"Skipping unparseable created_at on {collection.name} {doc['_id']}: {doc['created_at']!r}")
+                continue
+            if created_at.tzinfo is None:
+                created_at = created_at.replace(tzinfo=timezone.utc)
+            updates.append(UpdateOne(
+                {"_id": doc['_id'], "created_at": doc['created_at']},
+                {"$set": {"created_at": created_at}}
+            ))
+        if updates:
+            result = await collection.bulk_write(updates, ordered=False)
+            migrated += result.modified_count
+
+async def backfill_geo_points(collection, location_field: str, geo_field: str) -> int:
+    """Derive a GeoJSON point from ``location_field`` lat/lng for documents that lack ``geo_field``."""
+    result = await collection.update_many(
+        {
+            geo_field: {"$exists": False},
+            f"{location_field}.lat": {"$type": "number", "$gte": -90, "$lte": 90},
+            f"{location_field}.lng": {"$type": "number", "$gte": -180, "$lte": 180},
+            "$nor": [{f"{location_field}.lat": 0, f"{location_field}.lng": 0}]
+        },
+        [{"$set": {geo_field: {"type": "Point", "coordinates": [f"${location_field}.lng", f"${location_field}.lat"]}}}]
+    )
+    return result.modified_count
+
+async def backfill_expires_at(collection, batch_size: int = MIGRATION_BATCH_SIZE) -> int:
+    """Parse ``expiry_date`` into a BSON ``expires_at`` for donations written before it existed."""
+    backfilled = 0
+    last_id = None
+    while True:
+        query = {"expires_at": {"$exists": False}, "expiry_date": {"$type": "string"}}
+        if last_id is not None:
+            query['_id'] = {"$gt": last_id}
+        docs = await collection.find(query, {"_id": 1, "expiry_date": 1}).sort("_id", ASCENDING).limit(batch_size).to_list(batch_size)
+        if not docs:
+            return backfilled
+        last_id = docs[-1]['_id']
+        
+        # Unparseable dates are stored as null so they are not re-read on every start
+        updates = [
+            UpdateOne({"_id": doc['_id'], "expires_at": {"$exists": False}}, {"$set": {"expires_at": parse_expiry(doc['expiry_date'])}})
+            for doc in docs
+        ]
+        result = await collection.bulk_write(updates, ordered=False)
+        backfilled += result.modified_count
+
+# ============= USER CACHE =============
+
+class UserCache:
+    """Bounded LRU cache of authenticated users keyed by user id, with a TTL per entry."""
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, user_id: str) -> Optional[User]:
+        entry = self._entries.get(user_id)
+        if entry is None:
+            self.misses += 1
+            return None
+        user, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._entries[user_id]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(user_id)
+        self.hits += 1
+        return user
+
+    def set(self, user: User) -> None:
+        if self.max_size <= 0 or self.ttl_seconds <= 0:
+            return
+        self._entries[user.id] = (user, time.monotonic() + self.ttl_seconds)
+        self._entries.move_to_end(user.id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, user_id: str) -> None:
+        """Drop a user; call this whenever the user's document changes."""
+        self._entries.pop(user_id, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+user_cache = UserCache(USER_CACHE_MAX_SIZE, USER_CACHE_TTL_SECONDS)
+
+# ============= RESPONSE CACHE =============
+
+class CollectionVersions:
+    """Monotonic per-collection write counters used to validate cached ETags."""
+
+    def __init__(self):
+        self._versions = {}
+
+    def bump(self, collection_name: str) -> None:
+        self._versions[collection_name] = self._versions.get(collection_name, 0) + 1
+
+    def snapshot(self, collection_names) -> tuple:
+        return tuple(self._versions.get(name, 0) for name in collection_names)
+
+collection_versions = CollectionVersions()
+
+# (path pattern, collections the response depends on, Cache-Control)
+RESPONSE_CACHE_POLICIES = [
+    (re.compile(r"^/api/stats$"), ("impact_stats",), "public, max-age=5"),
+    (re.compile(r"^/api/donations$"), ("donations",), "private, no-cache"),
+    (re.compile(r"^/api/donations/[^/]+$"), ("donations",), "private, no-cache"),
+    (re.compile(r"^/api/orders/available(/nearby)?$"), ("orders",), "private, no-cache"),
+]
+
+def match_cache_policy(path: str) -> Optional[tuple]:
+    for pattern, collection_names, cache_control in RESPONSE_CACHE_POLICIES:
+        if pattern.match(path):
+            return collection_names, cache_control
+    return None
+
+class ResponseCache:
+    """LRU of the last ETag served per (caller, URL) and the collection versions it was built from.
+
+    A handler whose response also depends on the clock (listings that hide expired
+    donations) sets ``request.state.fresh_until``; the entry is stale from then on.
+    """
+
+    def __init__(self, max_entries: int, revalidate_seconds: float):
+        self.max_entries = max_entries
+        self.revalidate_seconds = revalidate_seconds
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self.not_modified = 0
+        self.misses = 0
+
+    def is_fresh(self, key: tuple, etag: str, versions: tuple) -> bool:
+        entry = self._entries.get(key)
+        if entry is None:
+            return False
+        cached_etag, cached_versions, stored_at, fresh_until = entry
+        if cached_etag != etag or cached_versions != versions:
+            return False
+        if fresh_until is not None and time.time() >= fresh_until:
+            return False
+        return time.monotonic() - stored_at < self.revalidate_seconds
+
+    def store(self, key: tuple, etag: str, versions: tuple, fresh_until: Optional[float] = None) -> None:
+        self._entries[key] = (etag, versions, time.monotonic(), fresh_until)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "not_modified_without_handler": self.not_modified,
+            "handler_runs": self.misses
+        }
+
+response_cache = ResponseCache(RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_REVALIDATE_SECONDS)
+
+def request_principal(request: Request) -> Optional[str]:
+    """Who the cached response belongs to: the JWT subject, "anonymous", or None for a bad token."""
+    authorization = request.headers.get("authorization")
+    if not authorization:
+        return "anonymous"
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer":
+        return None
+    try:
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]).get("sub")
+    except jwt.InvalidTokenError:
+        return None
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    return any(candidate.strip() in (etag, "*") for candidate in if_none_match.split(","))
+
+# ============= RATE LIMITING =============
+
+def parse_rate(value: str) -> tuple:
+    """``"<requests>/<seconds>"`` as (requests, seconds)."""
+    requests, _, seconds = value.partition("/")
+    return int(requests), float(seconds)
+
+# (path pattern, policy name, (requests, seconds), keyed per user when authenticated)
+RATE_LIMIT_POLICIES = [
+    (re.compile(r"^/api/auth/login$"), "login", parse_rate(RATE_LIMIT_LOGIN), False),
+    (re.compile(r"^/api/auth/register$"), "register", parse_rate(RATE_LIMIT_REGISTER), False),
+    (re.compile(r"^/api/stats$"), "stats", parse_rate(RATE_LIMIT_STATS), False),
+    (re.compile(r"^/api/(?!events/stream$|metrics$|health(/live|/ready)?$)"), "api", parse_rate(RATE_LIMIT_API), True),
+]
+
+TRUSTED_PROXY_NETWORKS = [ipaddress.ip_network(network.strip()) for network in RATE_LIMIT_TRUSTED_PROXIES.split(",") if network.strip()]
+
+def is_trusted_proxy(address: str) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in TRUSTED_PROXY_NETWORKS)
+
+def client_address(request: Request) -> str:
+    """The first address, walking X-Forwarded-For from the right, that is not a trusted proxy.
+
+    Entries left of the first untrusted hop were written by the client and are ignored.
+    """
+    address = request.client.host if request.client else "unknown"
+    forwarded = [hop.strip() for hop in request.headers.get("x-forwarded-for", "").split(",") if hop.strip()]
+    while forwarded and is_trusted_proxy(address):
+        address = forwarded.pop()
+    return address
+
+def match_rate_limit_policy(path: str) -> Optional[tuple]:
+    for pattern, name, rate, per_user in RATE_LIMIT_POLICIES:
+        if pattern.match(path):
+            return name, rate, per_user
+    return None
+
+class MemoryRateLimitStore:
+    """Token buckets kept in this process, one float per key.
+
+    A bucket is stored as the time it will be full again (the GCRA "theoretical
+    arrival time"), which carries the same information as a token count plus a
+    refill timestamp. A key whose time has passed is a full bucket, so dropping it
+    changes no decision; that is all eviction does. A store shared between workers
+    only has to implement take(), evict() and __len__() with the same meaning.
+    """
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._full_at = {}
+
+    async def take(self, key: str, requests: int, seconds: float) -> float:
+        """Spend one token from ``key``'s bucket; 0.0 if allowed, else seconds until a token is available."""
+        now = time.monotonic()
+        interval = seconds / requests
+        full_at = max(self._full_at.get(key, now), now)
+        # The bucket is empty once refilling it would take the whole period
+        retry_after = full_at + interval - now - seconds
+        if retry_after > 0:
+            return retry_after
+        if key not in self._full_at and len(self._full_at) >= self.max_keys:
+            self._make_room(now)
+        self._full_at[key] = full_at + interval
+        return 0.0
+
+    async def evict(self) -> int:
+        return self._evict(time.monotonic())
+
+    def _evict(self, now: float) -> int:
+        idle = [key for key, full_at in self._full_at.items() if full_at <= now]
+        for key in idle:
+            del self._full_at[key]
+        return len(idle)
+
+    def _make_room(self, now: float) -> None:
+        if self._evict(now):
+            return
+        # Every bucket is in use: forget the longest-tracked one
+        del self._full_at[next(iter(self._full_at))]
+
+    def __len__(self) -> int:
+        return len(self._full_at)
+
+class RateLimiter:
+    """Applies a policy's rate to a client's bucket in the store and counts the outcome."""
+
+    def __init__(self, store):
+        self.store = store
+        self.allowed = 0
+        self.limited = 0
+
+    async def check(self, policy: str, client_key: str, rate: tuple) -> float:
+        retry_after = await self.store.take(f"{policy}:{client_key}", *rate)
+        if retry_after:
+            self.limited += 1
+            rate_limited_total.inc((policy,))
+        else:
+            self.allowed += 1
+        return retry_after
+
+    def stats(self) -> dict:
+        return {"buckets": len(self.store), "allowed": self.allowed, "limited": self.limited}
+
+rate_limiter = RateLimiter(MemoryRateLimitStore(RATE_LIMIT_MAX_KEYS))
+
+async def evict_rate_limit_buckets_periodically() -> None:
+    while True:
+        await asyncio.sleep(RATE_LIMIT_EVICT_SECONDS)
+        await rate_limiter.store.evict()
+
+# ============= REAL-TIME EVENTS =============
+
+EVENT_SHAPES = {"donation": DONATION_SHAPE, "order": ORDER_SHAPE}
+
+def make_event(kind: str, action: str, doc: dict) -> dict:
+    """The document as the API returns it, so clients can update their lists in place.
+
+    ``payload`` is encoded once here rather than once per subscriber; ``brief_payload``
+    carries only id and status, for viewers who may learn that a listing changed but
+    not read it (drivers watching another driver's order).
+    """
+    data = {field: doc[field] for field in EVENT_SHAPES[kind].fields if field in doc}
+    return {
+        "type": f"{kind}.{action}",
+        "data": data,
+        "payload": dump_json(data).decode('utf-8'),
+        "brief_payload": dump_json({"id": data.get('id'), "status": data.get('status')}).decode('utf-8')
+    }
+
+class EventBroker:
+    """In-process fan-out of donation/order events to connected subscribers.
+
+    Each subscriber gets a bounded queue; a slow client loses its oldest events
+    rather than holding memory for everyone else.
+    """
+
+    def __init__(self, queue_size: int):
+        self.queue_size = queue_size
+        self._subscribers = set()
+        self.change_stream_active = False
+        self.published = 0
+        self.dropped = 0
+
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        self._subscribers.discard(queue)
+
+    def publish(self, event: dict) -> None:
+        self.published += 1
+        for queue in self._subscribers:
+            if queue.full():
+                queue.get_nowait()
+                self.dropped += 1
+            queue.put_nowait(event)
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": len(self._subscribers),
+            "change_stream_active": self.change_stream_active,
+            "published": self.published,
+            "dropped": self.dropped
+        }
+
+event_broker = EventBroker(EVENT_QUEUE_SIZE)
+
+def notify(kind: str, action: str, doc: dict) -> None:
+    """Publish a write made by this process, unless the change stream already delivers it."""
+    collection_versions.bump(f"{kind}s")
+    if kind == "donation":
+        donation_matcher.observe(doc)
+    if not event_broker.change_stream_active:
+        event_broker.publish(make_event(kind, action, doc))
+
+def event_visible_to(user: User, event: dict) -> bool:
+    data = event['data']
+    if user.role == "admin":
+        return True
+    if event['type'].startswith("donation."):
+        return user.role == "recipient" or data.get('donor_id') == user.id
+    if user.role == "driver":
+        return data.get('status') in ("pending", "assigned") or data.get('driver_id') == user.id
+    if user.role == "recipient":
+        return data.get('recipient_id') == user.id
+    return data.get('donor_id') == user.id
+
+def event_payload_for(user: User, event: dict) -> str:
+    """The encoding of a visible event that ``user`` may read.
+
+    Drivers can read pending orders (they are listed for every driver) and their own;
+    other drivers' orders only tell them to drop the order from the available list.
+    """
+    data = event['data']
+    if (user.role == "driver" and event['type'].startswith("order.")
+            and data.get('status') != "pending" and data.get('driver_id') != user.id):
+        return event['brief_payload']
+    return event['payload']
+
+async def watch_changes() -> None:
+    """Feed the broker from a MongoDB change stream so writes from every worker are seen."""
+    pipeline = [{"$match": {
+        "ns.coll": {"$in": ["donations", "orders"]},
+        "operationType": {"$in": ["insert", "update", "replace"]}
+    }}]
+    while True:
+        try:
+            async with db.watch(pipeline, full_document="updateLookup") as stream:
+                event_broker.change_stream_active = True
+                logger.info("Publishing real-time events from MongoDB change stream")
+                async for change in stream:
+                    doc = change.get('fullDocument')
+                    if not doc:
+                        continue
+                    collection_versions.bump(change['ns']['coll'])
+                    kind = "donation" if change['ns']['coll'] == "donations" else "order"
+                    if kind == "donation":
+                        donation_matcher.observe(doc)
+                    action = "created" if change['operationType'] == "insert" else "updated"
+                    event_broker.publish(make_event(kind, action, doc))
+        except OperationFailure as e:
+            logger.info(f"Change streams unavailable, publishing real-time events in-process: {e}")
+            return
+        except PyMongoError as e:
+            logger.warning(f"Change stream interrupted, retrying: {e}")
+            await asyncio.sleep(5)
+        finally:
+            event_broker.change_stream_active = False
+
+# ============= STATUS EVENTS =============
+
+class StatusEventLog:
+    """Write-behind, append-only log of order and donation status transitions.
+
+    record() only appends to an in-memory buffer, so handlers pay no extra
+    round trip. A background task writes the buffer with one unordered
+    insert_many whenever ``batch_size`` events are waiting or ``flush_seconds``
+    have passed. A batch that fails is put back and retried on the next flush;
+    the driver-assigned ``_id`` stays on each document, so events that did reach
+    the database are rejected as duplicates instead of being written twice. Past
+    ``max_buffered`` the oldest events are dropped and counted, as are events the
+    database rejects for any other reason (retrying those would fail again).
+    """
+
+    def __init__(self, batch_size: int, flush_seconds: float, max_buffered: int):
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.max_buffered = max_buffered
+        self._buffer = []
+        self._wakeup = None
+        self._flush_lock = None
+        self.recorded = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed_flushes = 0
+
+    def record(self, kind: str, entity_id: str, from_status: Optional[str], to_status: str, actor: Optional[User] = None) -> None:
+        self._buffer.append({
+            "id": str(uuid.uuid4()),
+            "kind": kind,
+            "entity_id": entity_id,
+            "from_status": from_status,
+            "to_status": to_status,
+            "actor_id": actor.id if actor else None,
+            "actor_role": actor.role if actor else None,
+            "created_at": datetime.now(timezone.utc)
+        })
+        self.recorded += 1
+        if len(self._buffer) > self.max_buffered:
+            overflow = len(self._buffer) - self.max_buffered
+            del self._buffer[:overflow]
+            self.dropped += overflow
+        if len(self._buffer) >= self.batch_size and self._wakeup is not None:
+            self._wakeup.set()
+
+    async def flush(self) -> int:
+        """Write every buffered event; returns how many were written."""
+        async with self._flush_lock:
+            written = 0
+            while self._buffer:
+                batch = self._buffer[:self.batch_size]
+                del self._buffer[:len(batch)]
+                try:
+                    failed = await repos.status_events.insert_many(batch)
+                except PyMongoError as e:
+                    self._buffer[:0] = batch
+                    self.failed_flushes += 1
+                    logger.warning(f"Status event flush failed, {len(self._buffer)} events buffered: {e}")
+                    break
+                except asyncio.CancelledError:
+                    # Shutdown interrupted the write; close() retries the batch
+                    self._buffer[:0] = batch
+                    raise
+                # A duplicate key means an earlier, failed-looking flush did write the event
+                rejected = [message for message in failed.values() if not message.startswith("E11000")]
+                if rejected:
+                    self.dropped += len(rejected)
+                    logger.error(f"Dropped {len(rejected)} status events the database rejected: {rejected[0]}")
+                written += len(batch) - len(rejected)
+            self.written += written
+            return written
+
+    async def run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    def start(self) -> asyncio.Task:
+        # Created here so they bind to the running loop rather than the one at import time
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        return asyncio.create_task(self.run())
+
+    async def close(self) -> None:
+        """Final flush at shutdown, after the flusher task has been cancelled."""
+        if self._flush_lock is None:
+            return
+        await self.flush()
+        if self._buffer:
+            logger.error(f"Discarding {len(self._buffer)} status events that could not be written")
+        self._wakeup = None
+        self._flush_lock = None
+
+    def stats(self) -> dict:
+        return {
+            "buffered": len(self._buffer),
+            "recorded": self.recorded,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed_flushes": self.failed_flushes
+        }
+
+status_log = StatusEventLog(STATUS_EVENT_BATCH_SIZE, STATUS_EVENT_FLUSH_SECONDS, STATUS_EVENT_MAX_BUFFERED)
+
+# Delivery-time analytics: (stage, from status, to status) measured per order
+# between the first event reaching each status
+DELIVERY_STAGES = [
+    ("pending_to_assigned", "pending", "assigned"),
+    ("assigned_to_in_transit", "assigned", "in_transit"),
+    ("in_transit_to_delivered", "in_transit", "delivered"),
+    ("pending_to_delivered", "pending", "delivered"),
+]
+
+async def delivery_time_report(since: datetime) -> dict:
+    """Minutes each order spent in every delivery stage, from order events since ``since``.
+
+    Past STATUS_EVENT_ANALYTICS_MAX_EVENTS only the most recent events are used;
+    ``covered_from`` then says where they start.
+    """
+    events = await repos.status_events.page(
+        {"kind": "order", "created_at": {"$gte": since}},
+        {"_id": 0, "id": 1, "entity_id": 1, "to_status": 1, "created_at": 1},
+        STATUS_EVENT_ANALYTICS_MAX_EVENTS
+    )
+    truncated = len(events) >= STATUS_EVENT_ANALYTICS_MAX_EVENTS
+    reached = {}
+    for event in events:
+        timeline = reached.setdefault(event['entity_id'], {})
+        first = timeline.get(event['to_status'])
+        if first is None or event['created_at'] < first:
+            timeline[event['to_status']] = event['created_at']
+    
+    stages = {}
+    for stage, start, end in DELIVERY_STAGES:
+        minutes = np.array([
+            (timeline[end] - timeline[start]).total_seconds() / 60
+            for timeline in reached.values()
+            if start in timeline and end in timeline
+        ])
+        stages[stage] = {
+            "orders": int(minutes.size),
+            "mean_minutes": round(float(minutes.mean()), 2) if minutes.size else None,
+            "p50_minutes": round(float(np.percentile(minutes, 50)), 2) if minutes.size else None,
+            "p90_minutes": round(float(np.percentile(minutes, 90)), 2) if minutes.size else None
+        }
+    return {
+        "since": since,
+        "covered_from": events[-1]['created_at'] if truncated else since,
+        "events": len(events),
+        "truncated": truncated,
+        "stages": stages
+    }
+
+# ============= IMPACT COUNTERS =============
+
+# Materialized counters behind the public /stats endpoint. Writes bump them with
+# $inc as they happen and a periodic reconciliation recomputes them from scratch.
+IMPACT_STATS_ID = "global"
+impact_stats_cache = {"value": None, "expires_at": 0.0}
+
+async def increment_impact_stats(**deltas) -> None:
+    await repos.impact.increment(deltas)
+    impact_stats_cache['value'] = None
+    collection_versions.bump("impact_stats")
+
+async def record_community(city: str) -> None:
+    if await repos.impact.add_community(city):
+        await increment_impact_stats(communities_served=1)
+
+async def reconcile_impact_stats() -> dict:
+    """Recompute every impact counter from the source collections."""
+    total_meals, active_donors, cities = await asyncio.gather(
+        repos.donations.count({"status": "delivered"}),
+        repos.users.count({"role": "donor"}),
+        repos.orders.distinct("delivery_location.city", {"status": "delivered"})
+    )
+    # Delivered orders whose location has no city count as one "Unknown" community
+    if await repos.orders.exists({"status": "delivered", "delivery_location.city": {"$exists": False}}):
+        cities.append("Unknown")
+    cities = set(cities)
+    
+    await repos.impact.set_communities(cities)
+    
+    stats = {"total_meals": total_meals, "active_donors": active_donors, "communities_served": len(cities)}
+    await repos.impact.replace(stats)
+    impact_stats_cache['value'] = None
+    collection_versions.bump("impact_stats")
+    return stats
+
+async def reconcile_impact_stats_periodically() -> None:
+    while True:
+        await asyncio.sleep(IMPACT_STATS_RECONCILE_SECONDS)
+        try:
+            await reconcile_impact_stats()
+        except PyMongoError as e:
+            logger.warning(f"Impact stats reconciliation failed: {e}")
+
+# ============= DONATION EXPIRY =============
+
+def parse_expiry(expiry_date: str) -> Optional[datetime]:
+    """``expiry_date`` as an aware UTC datetime, or None if it cannot be parsed."""
+    try:
+        expires_at = datetime.fromisoformat(expiry_date)
+    except (TypeError, ValueError):
+        return None
+    if expires_at.tzinfo is None:
+        expires_at = expires_at.replace(tzinfo=EXPIRY_TIMEZONE)
+    return expires_at.astimezone(timezone.utc)
+
+def expiry_deadline(docs: list) -> Optional[float]:
+    """Epoch seconds at which the first of ``docs`` expires, or None if none can."""
+    deadlines = [expires_at.timestamp() for expires_at in map(parse_expiry, (doc.get('expiry_date') for doc in docs)) if expires_at]
+    return min(deadlines, default=None)
+
+def not_expired(now: Optional[datetime] = None) -> dict:
+    """Query clause excluding donations past their expiry that the sweeper has not retired yet."""
+    return {"$not": {"$lte": now or datetime.now(timezone.utc)}}
+
+async def expire_donations(now: Optional[datetime] = None) -> int:
+    """Move available donations past their expiry to ``expired``, one batch at a time."""
+    now = now or datetime.now(timezone.utc)
+    expired = 0
+    while True:
+        docs = await repos.donations.find(
+            {"status": "available", "expires_at": {"$lte": now}},
+            {"_id": 0, "id": 1},
+            EXPIRY_SWEEP_BATCH_SIZE
+        )
+        if not docs:
+            return expired
+        
+        # One conditional update for the batch. Donations claimed (or expired by another
+        # worker) since the find are left alone; the sweep id marks the ones this
+        # update did change, so only those are read back and announced
+        ids = [doc['id'] for doc in docs]
+        sweep_id = str(uuid.uuid4())
+        await repos.donations.update_many(
+            {"id": {"$in": ids}, "status": "available"},
+            {"status": "expired", "expiry_sweep_id": sweep_id}
+        )
+        updated = await repos.donations.find(
+            {"id": {"$in": ids}, "expiry_sweep_id": sweep_id},
+            DONATION_SHAPE.projection,
+            len(ids)
+        )
+        for donation in updated:
+            expired += 1
+            notify("donation", "expired", donation)
+            status_log.record("donation", donation['id'], "available", "expired")
+
+async def expire_donations_periodically() -> None:
+    while True:
+        try:
+            expired = await expire_donations()
+            if expired:
+                logger.info(f"Expired {expired} donations")
+        except PyMongoError as e:
+            logger.warning(f"Donation expiry sweep failed: {e}")
+        await asyncio.sleep(EXPIRY_SWEEP_INTERVAL_SECONDS)
+
+# ============= DONATION MATCHING =============
+
+# Dietary tags donors can attach to a donation; recipients state the same
+# values as dietary_preferences. Each tag is one bit in a donation's mask.
+DIETARY_TAGS = ["Vegetarian", "Vegan", "Halal", "Kosher", "Gluten-Free", "Nut-Free"]
+DIETARY_BITS = {tag.lower(): 1 << bit for bit, tag in enumerate(DIETARY_TAGS)}
+POPCOUNT = np.array([bin(value).count("1") for value in range(1 << len(DIETARY_TAGS))], dtype=np.float64)
+
+# Score = weighted dietary coverage + proximity + expiry urgency, each in [0, 1]
+MATCH_WEIGHTS = {"dietary": 0.5, "distance": 0.3, "expiry": 0.2}
+MATCH_DISTANCE_SCALE_KM = 5.0
+MATCH_EXPIRY_SCALE_HOURS = 12.0
+
+def dietary_mask(tags: Optional[List[str]]) -> int:
+    mask = 0
+    for tag in tags or []:
+        mask |= DIETARY_BITS.get(tag.lower(), 0)
+    return mask
+
+class DonationMatcher:
+    """Columnar table of available donations, ranked for a recipient with NumPy.
+
+    Rows are appended as donations are created and flagged inactive when they
+    are claimed, delivered or expired; a periodic rebuild from the repository
+    compacts the table and picks up writes made by other workers.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self._allocate(capacity)
+        self.built_at = 0.0
+        self._rebuilding = False
+        self._pending = []
+
+    def _allocate(self, capacity: int) -> None:
+        self._ids = np.empty(capacity, dtype=object)
+        self._lat = np.full(capacity, np.nan)
+        self._lng = np.full(capacity, np.nan)
+        self._expires = np.full(capacity, np.inf)
+        self._tags = np.zeros(capacity, dtype=np.int64)
+        self._active = np.zeros(capacity, dtype=bool)
+        self._rows = {}
+        self._size = 0
 
-class UserRole(BaseModel):
-    role: str  # 'donor', 'recipient', 'driver'
+    def _grow(self) -> None:
+        capacity = len(self._ids) * 2
+        for name, fill in (("_ids", None), ("_lat", np.nan), ("_lng", np.nan), ("_expires", np.inf), ("_tags", 0), ("_active", False)):
+            old = getattr(self, name)
+            new = np.full(capacity, fill, dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
 
-class User(BaseModel):
-    model_config = ConfigDict(extra="ignore")
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    email: str
-    name: str
-    role: str  # 'donor', 'recipient', 'driver'
-    phone: Optional[str] = None
-    location: Optional[dict] = None
-    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    def _add(self, doc: dict) -> None:
+        if doc['id'] in self._rows:
+            self.discard(doc['id'])
+        if self._size == len(self._ids):
+            self._grow()
+        row = self._size
+        point = geo_lat_lng(doc.get('geo'))
+        expires_at = doc.get('expires_at')
+        self._ids[row] = doc['id']
+        self._lat[row], self._lng[row] = point if point else (np.nan, np.nan)
+        self._expires[row] = expires_at.timestamp() if expires_at else np.inf
+        self._tags[row] = dietary_mask(doc.get('dietary_tags'))
+        self._active[row] = True
+        self._rows[doc['id']] = row
+        self._size += 1
 
-class UserRegister(BaseModel):
-    email: EmailStr
-    password: str
-    name: str
-    role: str
-    phone: Optional[str] = None
+    def discard(self, donation_id: str) -> None:
+        row = self._rows.pop(donation_id, None)
+        if row is not None:
+            self._active[row] = False
 
-class UserLogin(BaseModel):
-    email: EmailStr
-    password: str
+    def observe(self, doc: dict) -> None:
+        """Track a donation write: full available documents are added, anything else removed."""
+        if self._rebuilding:
+            self._pending.append(doc)
+        if doc.get('status') == "available" and 'expiry_date' in doc:
+            self._add(doc)
+        elif doc.get('status') != "available":
+            self.discard(doc['id'])
 
-class Token(BaseModel):
-    access_token: str
-    token_type: str
-    user: User
+    async def rebuild(self) -> None:
+        self._rebuilding = True
+        self._pending = []
+        try:
+            docs = await repos.donations.find(
+                {"status": "available", "expires_at": not_expired()},
+                {"_id": 0, "id": 1, "geo": 1, "expires_at": 1, "dietary_tags": 1, "status": 1, "expiry_date": 1},
+                MATCH_TABLE_MAX_ROWS
+            )
+        finally:
+            self._rebuilding = False
+        self._allocate(max(1024, 1 << (len(docs) * 2 - 1).bit_length()))
+        for doc in docs:
+            self._add(doc)
+        # Replay writes observed while the query was running
+        for doc in self._pending:
+            self.observe(doc)
+        self._pending = []
+        self.built_at = time.monotonic()
 
-class Donation(BaseModel):
-    model_config = ConfigDict(extra="ignore")
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    donor_id: str
-    donor_name: str
-    food_type: str
-    quantity: str
-    prepared_at: Optional[str] = None  # prepared date and time (optional for backward compatibility)
-    expiry_date: str  # expiry date and time
-    description: Optional[str] = None
-    photo_url: Optional[str] = None
-    location: dict
-    status: str = "available"  # available, claimed, picked_up, delivered
-    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    def scores(self, lat: Optional[float], lng: Optional[float], preferences: Optional[List[str]], now: float) -> tuple:
+        """(rows, scores, distances_km) for every live, unexpired row."""
+        rows = np.flatnonzero(self._active[:self._size] & (self._expires[:self._size] > now))
+        
+        wanted = dietary_mask(preferences)
+        if wanted:
+            dietary = POPCOUNT[self._tags[rows] & wanted] / POPCOUNT[wanted]
+        else:
+            dietary = np.ones(len(rows))
+        
+        distances = np.full(len(rows), np.nan)
+        if lat is not None and lng is not None:
+            points = np.column_stack((self._lat[rows], self._lng[rows]))
+            distances = distances_from_km((lat, lng), points)
+        proximity = np.nan_to_num(np.exp(-distances / MATCH_DISTANCE_SCALE_KM), nan=0.0)
+        
+        hours_left = (self._expires[rows] - now) / 3600
+        urgency = np.nan_to_num(np.exp(-hours_left / MATCH_EXPIRY_SCALE_HOURS), nan=0.0)
+        
+        scores = (
+            MATCH_WEIGHTS["dietary"] * dietary
+            + MATCH_WEIGHTS["distance"] * proximity
+            + MATCH_WEIGHTS["expiry"] * urgency
+        )
+        return rows, scores, distances
 
-class DonationCreate(BaseModel):
-    food_type: str
-    quantity: str
-    prepared_at: str
-    expiry_date: str
-    description: Optional[str] = None
-    photo_url: Optional[str] = None
-    location: dict
+    def top(self, lat: Optional[float], lng: Optional[float], preferences: Optional[List[str]], limit: int, now: Optional[float] = None) -> List[tuple]:
+        """Best ``limit`` donations as (id, score, distance_km or None), highest score first."""
+        rows, scores, distances = self.scores(lat, lng, preferences, now if now is not None else time.time())
+        if len(rows) > limit:
+            best = np.argpartition(-scores, limit)[:limit]
+        else:
+            best = np.arange(len(rows))
+        best = best[np.argsort(-scores[best], kind="stable")]
+        return [
+            (self._ids[rows[index]], float(scores[index]), None if np.isnan(distances[index]) else float(distances[index]))
+            for index in best
+        ]
 
-class Order(BaseModel):
-    model_config = ConfigDict(extra="ignore")
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    donation_id: str
-    recipient_id: str
-    recipient_name: str
-    donor_id: str
-    driver_id: Optional[str] = None
-    driver_name: Optional[str] = None
-    status: str = "pending"  # pending, assigned, in_transit, delivered, cancelled
-    dietary_preferences: Optional[List[str]] = None
-    pickup_location: dict
-    delivery_location: dict
-    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
-    estimated_delivery: Optional[str] = None
+    def stats(self) -> dict:
+        return {"rows": self._size, "live": len(self._rows), "capacity": len(self._ids), "age_seconds": round(time.monotonic() - self.built_at, 1)}
 
-class OrderCreate(BaseModel):
-    donation_id: str
-    dietary_preferences: Optional[List[str]] = None
-    delivery_location: dict
+donation_matcher = DonationMatcher()
 
-class ImpactStats(BaseModel):
-    total_meals: int
-    active_donors: int
-    communities_served: int
-    co2_saved: float
+async def refresh_donation_matcher_periodically() -> None:
+    while True:
+        await asyncio.sleep(MATCH_TABLE_REFRESH_SECONDS)
+        try:
+            await donation_matcher.rebuild()
+        except PyMongoError as e:
+            logger.warning(f"Donation matcher rebuild failed: {e}")
 
 # ============= AUTH HELPERS =============
 
@@ -124,39 +2182,124 @@ def hash_password(password: str) -> str:
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
 
-def create_access_token(data: dict) -> str:
+class PasswordHasher:
+    """Runs bcrypt in a bounded thread pool so hashing never blocks the event loop.
+
+    bcrypt releases the GIL while hashing, so worker threads spread the work across
+    cores. Once ``max_pending`` jobs are queued or running, new jobs are rejected
+    with a 429 instead of piling up behind the pool. The pool exists between
+    start() and close(), which the lifespan calls, so it can be restarted.
+    """
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = None
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.queue_wait_seconds = 0.0
+        self.hash_seconds = 0.0
+        self.max_queue_wait_seconds = 0.0
+
+    def _timed(self, func, submitted_at: float, *args):
+        started_at = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            finished_at = time.perf_counter()
+            queue_wait = started_at - submitted_at
+            self.queue_wait_seconds += queue_wait
+            self.max_queue_wait_seconds = max(self.max_queue_wait_seconds, queue_wait)
+            self.hash_seconds += finished_at - started_at
+            operation = "verify" if func is verify_password else "hash"
+            password_queue_seconds.observe(queue_wait, (operation,))
+            password_hash_seconds.observe(finished_at - started_at, (operation,))
+
+    async def run(self, func, *args):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Authentication service is busy, please retry shortly",
+                headers={"Retry-After": "1"}
+            )
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, self._timed, func, time.perf_counter(), *args)
+        finally:
+            self.pending -= 1
+            self.completed += 1
+
+    async def hash(self, password: str) -> str:
+        return await self.run(hash_password, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self.run(verify_password, plain_password, hashed_password)
+
+    def start(self) -> None:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "pending": self.pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_queue_wait_ms": round(self.queue_wait_seconds / self.completed * 1000, 3) if self.completed else 0.0,
+            "max_queue_wait_ms": round(self.max_queue_wait_seconds * 1000, 3),
+            "avg_hash_ms": round(self.hash_seconds / self.completed * 1000, 3) if self.completed else 0.0
+        }
+
+password_hasher = PasswordHasher(PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_PENDING)
+
+def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
-    expire = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    expire = datetime.now(timezone.utc) + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> User:
+async def authenticate_token(token: str, scope: Optional[str] = None) -> User:
+    """Resolve the user of a token issued for ``scope`` (None for regular access tokens)."""
     try:
-        token = credentials.credentials
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id: str = payload.get("sub")
-        if user_id is None:
+        if user_id is None or payload.get("scope") != scope:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
         
-        user_doc = await db.users.find_one({"id": user_id}, {"_id": 0})
+        cached_user = user_cache.get(user_id)
+        if cached_user is not None:
+            return cached_user
+        
+        user_doc = await repos.users.get({"id": user_id})
         if user_doc is None:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
         
-        if isinstance(user_doc['created_at'], str):
-            user_doc['created_at'] = datetime.fromisoformat(user_doc['created_at'])
-        
-        return User(**user_doc)
+        user = User(**user_doc)
+        user_cache.set(user)
+        return user
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token expired")
-    except jwt.JWTError:
+    except jwt.InvalidTokenError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
 
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> User:
+    return await authenticate_token(credentials.credentials)
+
 # ============= AUTH ROUTES =============
 
 @api_router.post("/auth/register", response_model=Token)
 async def register(user_data: UserRegister):
     # Check if user exists
-    existing_user = await db.users.find_one({"email": user_data.email}, {"_id": 0})
+    existing_user = await repos.users.get({"email": user_data.email})
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     
@@ -169,10 +2312,16 @@ async def register(user_data: UserRegister):
     )
     
     user_dict = user.model_dump()
-    user_dict['created_at'] = user_dict['created_at'].isoformat()
-    user_dict['password'] = hash_password(user_data.password)
+    user_dict['password'] = await password_hasher.hash(user_data.password)
     
-    await db.users.insert_one(user_dict)
+    try:
+        await repos.users.insert(user_dict)
+    except DuplicateKeyError:
+        # A concurrent registration with the same email passed the check above first
+        raise HTTPException(status_code=400, detail="Email already registered")
+    user_cache.set(user)
+    if user.role == "donor":
+        await increment_impact_stats(active_donors=1)
     
     # Create token
     access_token = create_access_token(data={"sub": user.id, "email": user.email, "role": user.role})
@@ -181,18 +2330,16 @@ async def register(user_data: UserRegister):
 
 @api_router.post("/auth/login", response_model=Token)
 async def login(login_data: UserLogin):
-    user_doc = await db.users.find_one({"email": login_data.email}, {"_id": 0})
+    user_doc = await repos.users.get({"email": login_data.email})
     if not user_doc:
         raise HTTPException(status_code=401, detail="Invalid email or password")
     
-    if not verify_password(login_data.password, user_doc['password']):
+    if not await password_hasher.verify(login_data.password, user_doc['password']):
         raise HTTPException(status_code=401, detail="Invalid email or password")
     
-    if isinstance(user_doc['created_at'], str):
-        user_doc['created_at'] = datetime.fromisoformat(user_doc['created_at'])
-    
     user_doc.pop('password', None)
     user = User(**user_doc)
+    user_cache.set(user)
     
     access_token = create_access_token(data={"sub": user.id, "email": user.email, "role": user.role})
     
@@ -204,83 +2351,191 @@ async def get_me(current_user: User = Depends(get_current_user)):
 
 # ============= ADMIN ROUTES =============
 
-@api_router.get("/admin/donations", response_model=List[Donation])
-async def admin_get_all_donations(current_user: User = Depends(get_current_user)):
+@api_router.get("/admin/metrics")
+async def admin_get_metrics(current_user: User = Depends(get_current_user)):
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Admin access required")
     
-    donations = await db.donations.find({}, {"_id": 0}).sort("created_at", -1).to_list(1000)
-    
-    for donation in donations:
-        if isinstance(donation['created_at'], str):
-            donation['created_at'] = datetime.fromisoformat(donation['created_at'])
-    
-    return donations
+    return {
+        "user_cache": user_cache.stats(),
+        "password_hasher": password_hasher.stats(),
+        "events": event_broker.stats(),
+        "response_cache": response_cache.stats(),
+        "donation_matcher": donation_matcher.stats(),
+        "status_log": status_log.stats(),
+        "rate_limiter": rate_limiter.stats(),
+        "mongo": {
+            "pool": pool_monitor.stats(),
+            "commands": command_monitor.stats(),
+            "options": {option: os.environ[env_name] for option, (env_name, _) in MONGO_CLIENT_OPTIONS.items() if os.environ.get(env_name)}
+        }
+    }
 
-@api_router.get("/admin/orders", response_model=List[Order])
-async def admin_get_all_orders(current_user: User = Depends(get_current_user)):
+@api_router.get("/admin/donations", response_model=List[Donation])
+async def admin_get_all_donations(
+    response: Response,
+    limit: int = Query(1000, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Admin access required")
     
-    orders = await db.orders.find({}, {"_id": 0}).sort("created_at", -1).to_list(1000)
+    donations = await fetch_page(repos.donations, {}, DONATION_SHAPE.projection, limit, cursor, response)
     
-    for order in orders:
-        if isinstance(order['created_at'], str):
-            order['created_at'] = datetime.fromisoformat(order['created_at'])
-    
-    return orders
+    return fast_response(donations, DONATION_SHAPE, response)
 
-@api_router.get("/admin/stats")
-async def admin_get_detailed_stats(current_user: User = Depends(get_current_user)):
+@api_router.get("/admin/orders", response_model=List[Order])
+async def admin_get_all_orders(
+    response: Response,
+    limit: int = Query(1000, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Admin access required")
     
-    total_donations = await db.donations.count_documents({})
-    total_orders = await db.orders.count_documents({})
-    pending_orders = await db.orders.count_documents({"status": "pending"})
-    assigned_orders = await db.orders.count_documents({"status": "assigned"})
-    in_transit_orders = await db.orders.count_documents({"status": "in_transit"})
-    delivered_orders = await db.orders.count_documents({"status": "delivered"})
+    orders = await fetch_page(repos.orders, {}, ORDER_SHAPE.projection, limit, cursor, response)
     
-    total_users = await db.users.count_documents({})
-    donors = await db.users.count_documents({"role": "donor"})
-    recipients = await db.users.count_documents({"role": "recipient"})
-    drivers = await db.users.count_documents({"role": "driver"})
+    return fast_response(orders, ORDER_SHAPE, response)
+
+async def compute_admin_stats() -> dict:
+    donation_counts, order_counts, user_counts = await asyncio.gather(
+        repos.donations.count_by("status"),
+        repos.orders.count_by("status"),
+        repos.users.count_by("role")
+    )
     
     return {
         "donations": {
-            "total": total_donations,
-            "available": await db.donations.count_documents({"status": "available"}),
-            "claimed": await db.donations.count_documents({"status": "claimed"}),
-            "delivered": await db.donations.count_documents({"status": "delivered"})
+            "total": sum(donation_counts.values()),
+            "available": donation_counts.get("available", 0),
+            "claimed": donation_counts.get("claimed", 0),
+            "delivered": donation_counts.get("delivered", 0),
+            "expired": donation_counts.get("expired", 0)
         },
         "orders": {
-            "total": total_orders,
-            "pending": pending_orders,
-            "assigned": assigned_orders,
-            "in_transit": in_transit_orders,
-            "delivered": delivered_orders
+            "total": sum(order_counts.values()),
+            "pending": order_counts.get("pending", 0),
+            "assigned": order_counts.get("assigned", 0),
+            "in_transit": order_counts.get("in_transit", 0),
+            "delivered": order_counts.get("delivered", 0),
+            "cancelled": order_counts.get("cancelled", 0)
         },
         "users": {
-            "total": total_users,
-            "donors": donors,
-            "recipients": recipients,
-            "drivers": drivers
+            "total": sum(user_counts.values()),
+            "donors": user_counts.get("donor", 0),
+            "recipients": user_counts.get("recipient", 0),
+            "drivers": user_counts.get("driver", 0)
         }
     }
 
-@api_router.get("/admin/users", response_model=List[User])
-async def admin_get_all_users(current_user: User = Depends(get_current_user)):
+admin_stats_cache = {"value": None, "expires_at": 0.0}
+
+@api_router.get("/admin/indexes")
+async def admin_get_index_report(current_user: User = Depends(get_current_user)):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    if db is None:
+        raise HTTPException(status_code=501, detail="Index report requires the MongoDB backend")
+    
+    return await index_report()
+
+@api_router.get("/admin/stats")
+async def admin_get_detailed_stats(current_user: User = Depends(get_current_user)):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    if admin_stats_cache['value'] is not None and admin_stats_cache['expires_at'] > time.monotonic():
+        return admin_stats_cache['value']
+    
+    stats = await compute_admin_stats()
+    if ADMIN_STATS_CACHE_TTL_SECONDS > 0:
+        admin_stats_cache['value'] = stats
+        admin_stats_cache['expires_at'] = time.monotonic() + ADMIN_STATS_CACHE_TTL_SECONDS
+    
+    return stats
+
+def export_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+async def export_rows(repository, query: dict, projection: dict, fields: List[str], export_format: str):
+    """Yield the export body chunk by chunk so memory stays bounded by one batch."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if export_format == "csv":
+        writer.writerow(fields)
+    
+    rows = 0
+    async for doc in repository.iterate(query, projection, EXPORT_BATCH_SIZE):
+        if export_format == "csv":
+            writer.writerow([
+                json.dumps(doc.get(field)) if isinstance(doc.get(field), (dict, list)) else export_value(doc.get(field))
+                for field in fields
+            ])
+        else:
+            buffer.write(json.dumps({field: export_value(doc.get(field)) for field in fields}, default=str))
+            buffer.write("\n")
+        rows += 1
+        if rows % EXPORT_BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    
+    if buffer.tell():
+        yield buffer.getvalue()
+
+EXPORTS = {
+    "donations": ({}, {"_id": 0}, list(Donation.model_fields)),
+    "orders": ({}, {"_id": 0}, list(Order.model_fields)),
+    "users": ({"role": {"$ne": "admin"}}, {"_id": 0, "password": 0}, list(User.model_fields)),
+}
+
+@api_router.get("/admin/analytics/delivery-times")
+async def admin_delivery_times(days: int = Query(7, ge=1, le=365), current_user: User = Depends(get_current_user)):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    return await delivery_time_report(datetime.now(timezone.utc) - timedelta(days=days))
+
+@api_router.get("/admin/export/{collection_name}")
+async def admin_export(
+    collection_name: str,
+    export_format: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"),
+    current_user: User = Depends(get_current_user)
+):
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Admin access required")
     
-    users = await db.users.find({"role": {"$ne": "admin"}}, {"_id": 0, "password": 0}).sort("created_at", -1).to_list(1000)
+    if collection_name not in EXPORTS:
+        raise HTTPException(status_code=404, detail="Unknown export")
+    
+    query, projection, fields = EXPORTS[collection_name]
+    media_type = "text/csv" if export_format == "csv" else "application/x-ndjson"
+    filename = f"{collection_name}.{'csv' if export_format == 'csv' else 'ndjson'}"
+    
+    return StreamingResponse(
+        export_rows(getattr(repos, collection_name), query, projection, fields, export_format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@api_router.get("/admin/users", response_model=List[User])
+async def admin_get_all_users(
+    response: Response,
+    limit: int = Query(1000, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
     
-    for user in users:
-        if isinstance(user['created_at'], str):
-            user['created_at'] = datetime.fromisoformat(user['created_at'])
+    users = await fetch_page(repos.users, {"role": {"$ne": "admin"}}, USER_SHAPE.projection, limit, cursor, response)
     
-    return users
+    return fast_response(users, USER_SHAPE, response)
 
 # ============= DONATION ROUTES =============
 
@@ -296,52 +2551,238 @@ async def create_donation(donation_data: DonationCreate, current_user: User = De
     )
     
     donation_dict = donation.model_dump()
-    donation_dict['created_at'] = donation_dict['created_at'].isoformat()
+    donation_dict['geo'] = geo_point(donation.location)
+    donation_dict['expires_at'] = parse_expiry(donation.expiry_date)
     
-    await db.donations.insert_one(donation_dict)
+    await repos.donations.insert(donation_dict)
+    notify("donation", "created", donation_dict)
+    status_log.record("donation", donation.id, None, "available", current_user)
     return donation
 
+async def insert_donations(items: list, current_user: User) -> BulkDonationResult:
+    """Validate each raw item on its own, then write every valid one with a single unordered insert_many."""
+    if len(items) > BULK_DONATION_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {BULK_DONATION_MAX_ITEMS} donations per request")
+    
+    results = []
+    docs = []
+    doc_indexes = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            results.append(BulkItemResult(index=index, status="error", errors=["Item must be a JSON object"]))
+            continue
+        try:
+            donation_data = DonationCreate.model_validate(item)
+        except ValidationError as e:
+            results.append(BulkItemResult(
+                index=index,
+                status="error",
+                errors=[f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in e.errors()]
+            ))
+            continue
+        donation = Donation(donor_id=current_user.id, donor_name=current_user.name, **donation_data.model_dump())
+        donation_dict = donation.model_dump()
+        donation_dict['geo'] = geo_point(donation.location)
+        donation_dict['expires_at'] = parse_expiry(donation.expiry_date)
+        docs.append(donation_dict)
+        doc_indexes.append(index)
+        results.append(BulkItemResult(index=index, status="created", id=donation.id))
+    
+    failed_writes = await repos.donations.insert_many(docs) if docs else {}
+    
+    by_index = {result.index: result for result in results}
+    for position, doc in enumerate(docs):
+        if position in failed_writes:
+            result = by_index[doc_indexes[position]]
+            result.status = "error"
+            result.id = None
+            result.errors = [failed_writes[position]]
+        else:
+            notify("donation", "created", doc)
+            status_log.record("donation", doc['id'], None, "available", current_user)
+    
+    created = sum(1 for result in results if result.status == "created")
+    return BulkDonationResult(created=created, failed=len(results) - created, results=results)
+
+def parse_donation_upload(filename: str, content: bytes) -> list:
+    """Rows from an NDJSON or CSV upload as raw dicts.
+
+    CSV address/city/lat/lng columns form the location and dietary_tags is a ``;``-separated list.
+    """
+    try:
+        text = content.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="Upload must be UTF-8 encoded")
+    if filename.endswith(".ndjson") or filename.endswith(".jsonl"):
+        items = []
+        for line_number, line in enumerate(text.splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                items.append(json.loads(line))
+            except ValueError:
+                raise HTTPException(status_code=400, detail=f"Invalid JSON on line {line_number}")
+        return items
+    
+    if filename.endswith(".csv"):
+        items = []
+        for row in csv.DictReader(io.StringIO(text)):
+            item = {key: value for key, value in row.items() if key and value not in (None, "")}
+            location = {}
+            for field in ("address", "city"):
+                if field in item:
+                    location[field] = item.pop(field)
+            for field in ("lat", "lng"):
+                if field in item:
+                    try:
+                        location[field] = float(item.pop(field))
+                    except ValueError:
+                        location[field] = None
+            item['location'] = location
+            if 'dietary_tags' in item:
+                item['dietary_tags'] = [tag.strip() for tag in item['dietary_tags'].split(";") if tag.strip()]
+            items.append(item)
+        return items
+    
+    raise HTTPException(status_code=400, detail="Upload must be a .csv or .ndjson file")
+
+@api_router.post("/donations/bulk", response_model=BulkDonationResult)
+async def create_donations_bulk(items: List[Any], current_user: User = Depends(get_current_user)):
+    if current_user.role != "donor":
+        raise HTTPException(status_code=403, detail="Only donors can create donations")
+    
+    return await insert_donations(items, current_user)
+
+@api_router.post("/donations/bulk/upload", response_model=BulkDonationResult)
+async def upload_donations_bulk(file: UploadFile = File(...), current_user: User = Depends(get_current_user)):
+    if current_user.role != "donor":
+        raise HTTPException(status_code=403, detail="Only donors can create donations")
+    
+    items = parse_donation_upload((file.filename or "").lower(), await file.read())
+    return await insert_donations(items, current_user)
+
 @api_router.get("/donations", response_model=List[Donation])
-async def get_donations(status_filter: Optional[str] = None, current_user: User = Depends(get_current_user)):
+async def get_donations(
+    request: Request,
+    response: Response,
+    status_filter: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
     query = {}
     if status_filter:
         query['status'] = status_filter
+        if status_filter == "available":
+            query['expires_at'] = not_expired()
     
     if current_user.role == "donor":
         query['donor_id'] = current_user.id
     
-    donations = await db.donations.find(query, {"_id": 0}).sort("created_at", -1).to_list(100)
+    donations = await fetch_page(repos.donations, query, DONATION_SHAPE.projection, limit, cursor, response)
+    if status_filter == "available":
+        # The page changes when its first donation expires, whether or not the sweeper has run
+        request.state.fresh_until = expiry_deadline(donations)
+    
+    return fast_response(donations, DONATION_SHAPE, response)
+
+@api_router.get("/donations/nearby", response_model=List[NearbyDonation])
+async def get_nearby_donations(
+    request: Request,
+    lat: float = Query(..., ge=-90, le=90),
+    lng: float = Query(..., ge=-180, le=180),
+    radius_km: float = Query(10, gt=0, le=200),
+    status_filter: Optional[str] = "available",
+    limit: int = Query(50, ge=1, le=500),
+    current_user: User = Depends(get_current_user)
+):
+    query = {}
+    if status_filter:
+        query['status'] = status_filter
+        if status_filter == "available":
+            query['expires_at'] = not_expired()
     
-    for donation in donations:
-        if isinstance(donation['created_at'], str):
-            donation['created_at'] = datetime.fromisoformat(donation['created_at'])
+    if current_user.role == "donor":
+        query['donor_id'] = current_user.id
     
+    donations = await geo_near(repos.donations, "geo", lat, lng, radius_km, query, limit)
+    if status_filter == "available":
+        request.state.fresh_until = expiry_deadline(donations)
     return donations
 
+@api_router.get("/donations/matches", response_model=List[DonationMatch])
+async def match_donations(
+    request: Request,
+    lat: Optional[float] = Query(None, ge=-90, le=90),
+    lng: Optional[float] = Query(None, ge=-180, le=180),
+    dietary: List[str] = Query([]),
+    limit: int = Query(20, ge=1, le=100),
+    current_user: User = Depends(get_current_user)
+):
+    """Available donations ranked by dietary fit, distance from (lat, lng) and how soon they expire."""
+    if current_user.role != "recipient":
+        raise HTTPException(status_code=403, detail="Only recipients can request matches")
+    
+    # Over-fetch so donations claimed elsewhere since the last rebuild can be dropped
+    ranked = donation_matcher.top(lat, lng, dietary, limit * 2)
+    docs = await repos.donations.find(
+        {"id": {"$in": [donation_id for donation_id, _, _ in ranked]}, "status": "available"},
+        DONATION_SHAPE.projection,
+        len(ranked)
+    )
+    by_id = {doc['id']: doc for doc in docs}
+    
+    matches = []
+    for donation_id, score, distance_km in ranked:
+        doc = by_id.get(donation_id)
+        if doc is None:
+            donation_matcher.discard(donation_id)
+            continue
+        matches.append({**doc, "score": round(score, 4), "distance_km": None if distance_km is None else round(distance_km, 3)})
+        if len(matches) == limit:
+            break
+    # The matcher drops donations once they expire, so the list changes then too
+    request.state.fresh_until = expiry_deadline(matches)
+    return matches
+
 @api_router.get("/donations/{donation_id}", response_model=Donation)
 async def get_donation(donation_id: str, current_user: User = Depends(get_current_user)):
-    donation = await db.donations.find_one({"id": donation_id}, {"_id": 0})
+    donation = await repos.donations.get({"id": donation_id}, DONATION_SHAPE.projection)
     if not donation:
         raise HTTPException(status_code=404, detail="Donation not found")
     
-    if isinstance(donation['created_at'], str):
-        donation['created_at'] = datetime.fromisoformat(donation['created_at'])
-    
-    return Donation(**donation)
+    return fast_response(donation, DONATION_SHAPE)
 
 # ============= ORDER ROUTES =============
 
+# Order lifecycle. Drivers take pending orders with /orders/{id}/assign; every later
+# step goes through /orders/{id}/status. Target status -> (statuses it can be
+# reached from, roles allowed to make the move):
+#
+#   pending -> assigned -> in_transit -> delivered
+#   pending | assigned -> cancelled (the donation goes back to available)
+ORDER_TRANSITIONS = {
+    "in_transit": (("assigned",), ("driver", "admin")),
+    "delivered": (("in_transit",), ("driver", "admin")),
+    "cancelled": (("pending", "assigned"), ("recipient", "admin")),
+}
+
+# Drivers and recipients may only move orders they are party to
+ORDER_OWNER_FIELDS = {"driver": "driver_id", "recipient": "recipient_id"}
+
 @api_router.post("/orders", response_model=Order)
 async def create_order(order_data: OrderCreate, current_user: User = Depends(get_current_user)):
     if current_user.role != "recipient":
         raise HTTPException(status_code=403, detail="Only recipients can create orders")
     
-    # Get donation
-    donation = await db.donations.find_one({"id": order_data.donation_id}, {"_id": 0})
+    # Claim the donation atomically: only one caller can flip it from available to claimed
+    donation = await repos.donations.find_and_update(
+        {"id": order_data.donation_id, "status": "available", "expires_at": not_expired()},
+        {"status": "claimed"}
+    )
     if not donation:
-        raise HTTPException(status_code=404, detail="Donation not found")
-    
-    if donation['status'] != "available":
+        if not await repos.donations.exists({"id": order_data.donation_id}):
+            raise HTTPException(status_code=404, detail="Donation not found")
         raise HTTPException(status_code=400, detail="Donation is not available")
     
     # Create order
@@ -356,16 +2797,28 @@ async def create_order(order_data: OrderCreate, current_user: User = Depends(get
     )
     
     order_dict = order.model_dump()
-    order_dict['created_at'] = order_dict['created_at'].isoformat()
-    
-    # Update donation status
-    await db.donations.update_one({"id": order_data.donation_id}, {"$set": {"status": "claimed"}})
+    order_dict['pickup_geo'] = donation.get('geo') or geo_point(donation['location'])
+    order_dict['delivery_geo'] = geo_point(order_data.delivery_location)
     
-    await db.orders.insert_one(order_dict)
+    try:
+        await repos.orders.insert(order_dict)
+    except Exception:
+        # Release the claim so the donation does not get stuck without an order
+        await repos.donations.update({"id": order_data.donation_id, "status": "claimed"}, {"status": "available"})
+        raise
+    notify("donation", "updated", donation)
+    notify("order", "created", order_dict)
+    status_log.record("donation", donation['id'], "available", "claimed", current_user)
+    status_log.record("order", order.id, None, "pending", current_user)
     return order
 
 @api_router.get("/orders", response_model=List[Order])
-async def get_orders(current_user: User = Depends(get_current_user)):
+async def get_orders(
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
     query = {}
     if current_user.role == "recipient":
         query['recipient_id'] = current_user.id
@@ -374,95 +2827,381 @@ async def get_orders(current_user: User = Depends(get_current_user)):
     elif current_user.role == "driver":
         query['driver_id'] = current_user.id
     
-    orders = await db.orders.find(query, {"_id": 0}).sort("created_at", -1).to_list(100)
-    
-    for order in orders:
-        if isinstance(order['created_at'], str):
-            order['created_at'] = datetime.fromisoformat(order['created_at'])
+    orders = await fetch_page(repos.orders, query, ORDER_SHAPE.projection, limit, cursor, response)
     
-    return orders
+    return fast_response(orders, ORDER_SHAPE, response)
 
 @api_router.get("/orders/available", response_model=List[Order])
-async def get_available_orders(current_user: User = Depends(get_current_user)):
+async def get_available_orders(
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    if current_user.role != "driver":
+        raise HTTPException(status_code=403, detail="Only drivers can view available orders")
+    
+    orders = await fetch_page(repos.orders, {"status": "pending", "driver_id": None}, ORDER_SHAPE.projection, limit, cursor, response)
+    
+    return fast_response(orders, ORDER_SHAPE, response)
+
+@api_router.get("/orders/available/nearby", response_model=List[NearbyOrder])
+async def get_nearby_available_orders(
+    lat: float = Query(..., ge=-90, le=90),
+    lng: float = Query(..., ge=-180, le=180),
+    radius_km: float = Query(10, gt=0, le=200),
+    limit: int = Query(50, ge=1, le=500),
+    current_user: User = Depends(get_current_user)
+):
     if current_user.role != "driver":
         raise HTTPException(status_code=403, detail="Only drivers can view available orders")
     
-    orders = await db.orders.find({"status": "pending", "driver_id": None}, {"_id": 0}).sort("created_at", -1).to_list(100)
+    return await geo_near(repos.orders, "pickup_geo", lat, lng, radius_km, {"status": "pending", "driver_id": None}, limit)
+
+@api_router.post("/orders/batch-assign", response_model=RoutePlan)
+async def batch_assign_orders(assignment: BatchAssignRequest, current_user: User = Depends(get_current_user)):
+    """Assign up to ``max_orders`` nearby pending orders to the driver and return them as one ordered trip."""
+    if current_user.role != "driver":
+        raise HTTPException(status_code=403, detail="Only drivers can assign themselves")
+    
+    candidates = await repos.orders.near(
+        "pickup_geo", assignment.lat, assignment.lng, assignment.radius_km,
+        {"status": "pending", "driver_id": None}, ROUTE_CANDIDATE_LIMIT
+    )
+    origin = (assignment.lat, assignment.lng)
+    points = np.array([geo_lat_lng(candidate['pickup_geo']) for candidate in candidates], dtype=float).reshape(-1, 2)
+    
+    # Claim along the nearest-pickup walk; orders taken by another driver meanwhile are skipped
+    claimed = []
+    selection_seconds = 0.0
+    walk = nearest_neighbour_walk(origin, points)
+    while len(claimed) < assignment.max_orders:
+        started_at = time.perf_counter()
+        index = next(walk, None)
+        selection_seconds += time.perf_counter() - started_at
+        if index is None:
+            break
+        order = await repos.orders.find_and_update(
+            {"id": candidates[index]['id'], "status": "pending"},
+            {"driver_id": current_user.id, "driver_name": current_user.name, "status": "assigned"}
+        )
+        if order:
+            claimed.append(order)
+            notify("order", "updated", order)
+            status_log.record("order", order['id'], "pending", "assigned", current_user)
+    route_planning_seconds.observe(selection_seconds, ("select",))
     
-    for order in orders:
-        if isinstance(order['created_at'], str):
-            order['created_at'] = datetime.fromisoformat(order['created_at'])
+    started_at = time.perf_counter()
+    stops, distance_km = plan_route(origin, claimed) if claimed else ([], 0.0)
+    route_planning_seconds.observe(time.perf_counter() - started_at, ("route",))
     
-    return orders
+    by_id = {order['id']: order for order in claimed}
+    ordered = [by_id[stop['order_id']] for stop in stops if stop['kind'] == "pickup"]
+    return RoutePlan(orders=ordered, stops=stops, distance_km=distance_km)
 
 @api_router.patch("/orders/{order_id}/assign")
 async def assign_driver(order_id: str, current_user: User = Depends(get_current_user)):
     if current_user.role != "driver":
         raise HTTPException(status_code=403, detail="Only drivers can assign themselves")
     
-    order = await db.orders.find_one({"id": order_id}, {"_id": 0})
+    order = await repos.orders.find_and_update(
+        {"id": order_id, "status": "pending"},
+        {"driver_id": current_user.id, "driver_name": current_user.name, "status": "assigned"}
+    )
     if not order:
-        raise HTTPException(status_code=404, detail="Order not found")
-    
-    if order['status'] != "pending":
+        if not await repos.orders.exists({"id": order_id}):
+            raise HTTPException(status_code=404, detail="Order not found")
         raise HTTPException(status_code=400, detail="Order is not available")
-    
-    await db.orders.update_one(
-        {"id": order_id},
-        {"$set": {"driver_id": current_user.id, "driver_name": current_user.name, "status": "assigned"}}
-    )
+    notify("order", "updated", order)
+    status_log.record("order", order_id, "pending", "assigned", current_user)
     
     return {"message": "Order assigned successfully"}
 
+async def complete_donation(order: dict, current_user: User) -> None:
+    """Mark a delivered order's donation delivered; only the first delivery counts towards impact."""
+    delivered = await repos.donations.update({"id": order['donation_id'], "status": "claimed"}, {"status": "delivered"})
+    if delivered:
+        notify("donation", "updated", {"id": order['donation_id'], "status": "delivered", "donor_id": order['donor_id']})
+        status_log.record("donation", order['donation_id'], "claimed", "delivered", current_user)
+        await increment_impact_stats(total_meals=1)
+        await record_community((order.get('delivery_location') or {}).get('city', 'Unknown'))
+
+async def release_donation(order: dict, current_user: User) -> None:
+    """Offer a cancelled order's donation to other recipients again."""
+    donation = await repos.donations.find_and_update({"id": order['donation_id'], "status": "claimed"}, {"status": "available"})
+    if donation:
+        notify("donation", "updated", donation)
+        status_log.record("donation", order['donation_id'], "claimed", "available", current_user)
+
 @api_router.patch("/orders/{order_id}/status")
 async def update_order_status(order_id: str, new_status: str, current_user: User = Depends(get_current_user)):
-    order = await db.orders.find_one({"id": order_id}, {"_id": 0})
-    if not order:
-        raise HTTPException(status_code=404, detail="Order not found")
-    
-    # Validate status transition
-    valid_statuses = ["pending", "assigned", "in_transit", "delivered", "cancelled"]
-    if new_status not in valid_statuses:
+    """Move an order one step along ORDER_TRANSITIONS with a single conditional update.
+
+    The update only matches while the order is in an allowed source status and
+    belongs to the caller, so racing or replayed requests cannot skip a step.
+    Repeating a transition that already happened succeeds without repeating it.
+    """
+    if new_status not in ORDER_TRANSITIONS:
         raise HTTPException(status_code=400, detail="Invalid status")
+    from_statuses, roles = ORDER_TRANSITIONS[new_status]
+    if current_user.role not in roles:
+        raise HTTPException(status_code=403, detail=f"Only {' and '.join(f'{role}s' for role in roles)} can mark orders {new_status}")
+    
+    query = {"id": order_id, "status": {"$in": list(from_statuses)}}
+    owner_field = ORDER_OWNER_FIELDS.get(current_user.role)
+    if owner_field:
+        query[owner_field] = current_user.id
+    order = await repos.orders.find_and_update(query, {"status": new_status}, original=True)
+    
+    if not order:
+        # Only a rejected or repeated transition pays for a second read, to tell which it was
+        order = await repos.orders.get({"id": order_id})
+        if not order:
+            raise HTTPException(status_code=404, detail="Order not found")
+        if owner_field and order.get(owner_field) != current_user.id:
+            raise HTTPException(status_code=403, detail="You can only update your own orders")
+        if order['status'] != new_status:
+            raise HTTPException(status_code=400, detail=f"Cannot change order from {order['status']} to {new_status}")
+        if new_status == "delivered":
+            # The earlier attempt may have failed between the order and donation writes
+            await complete_donation(order, current_user)
+        return {"message": "Order status updated successfully"}
     
-    await db.orders.update_one({"id": order_id}, {"$set": {"status": new_status}})
+    notify("order", "updated", {**order, "status": new_status})
+    status_log.record("order", order_id, order['status'], new_status, current_user)
     
-    # Update donation status if order is delivered
     if new_status == "delivered":
-        await db.donations.update_one({"id": order['donation_id']}, {"$set": {"status": "delivered"}})
+        await complete_donation(order, current_user)
+    elif new_status == "cancelled":
+        await release_donation(order, current_user)
     
     return {"message": "Order status updated successfully"}
 
+# ============= EVENT STREAM =============
+
+@api_router.post("/events/token")
+async def create_event_stream_token(current_user: User = Depends(get_current_user)):
+    """A short-lived token that only opens the event stream.
+
+    EventSource cannot send an Authorization header, so the stream token goes in the
+    URL, where proxies and browser history may record it; the access token never does.
+    """
+    token = create_access_token(
+        {"sub": current_user.id, "scope": "events"},
+        timedelta(seconds=EVENT_STREAM_TOKEN_SECONDS)
+    )
+    return {"token": token, "expires_in": EVENT_STREAM_TOKEN_SECONDS}
+
+@api_router.get("/events/stream")
+async def stream_events(request: Request, token: str):
+    """Server-sent events for donation/order changes visible to the caller.
+
+    ``token`` comes from POST /events/token and is only checked when connecting.
+    """
+    current_user = await authenticate_token(token, scope="events")
+    queue = event_broker.subscribe()
+    
+    async def event_source():
+        try:
+            yield ": connected\n\n"
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=EVENT_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if event_visible_to(current_user, event):
+                    yield f"event: {event['type']}\ndata: {event_payload_for(current_user, event)}\n\n"
+        finally:
+            event_broker.unsubscribe(queue)
+    
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# ============= PROMETHEUS =============
+
+@api_router.get("/metrics", include_in_schema=False)
+async def prometheus_metrics(request: Request):
+    if not METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not hmac.compare_digest(request.headers.get("authorization", "").encode(), f"Bearer {METRICS_TOKEN}".encode()):
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    for component, stats in (
+        ("user_cache", user_cache.stats()),
+        ("password_hasher", password_hasher.stats()),
+        ("events", event_broker.stats()),
+        ("response_cache", response_cache.stats()),
+        ("donation_matcher", donation_matcher.stats()),
+        ("status_log", status_log.stats()),
+        ("rate_limiter", rate_limiter.stats()),
+        ("mongo_pool", pool_monitor.stats()),
+        ("mongo_commands", command_monitor.stats())
+    ):
+        lines.extend(render_gauges(f"secondserve_{component}", stats))
+    return PlainTextResponse("\n".join(lines) + "\n", media_type="text/plain; version=0.0.4")
+
+# ============= HEALTH =============
+
+# Per worker: ready once startup has finished, draining from the start of shutdown
+worker_state = {"ready": False, "draining": False}
+
+@api_router.get("/health")
+async def health():
+    if db is not None:
+        try:
+            await asyncio.wait_for(db.command("ping"), timeout=2)
+        except (PyMongoError, asyncio.TimeoutError):
+            raise HTTPException(status_code=503, detail="Database unavailable")
+    
+    return {"status": "ok", "connections_open": pool_monitor.connections_open, "mongo_in_flight": command_monitor.in_flight}
+
+@api_router.get("/health/live")
+async def liveness():
+    """The worker's event loop is serving requests. Checks no dependencies, so a
+    database outage does not get healthy workers restarted."""
+    return {"status": "ok", "pid": os.getpid()}
+
+@api_router.get("/health/ready")
+async def readiness():
+    """Startup has finished, the worker is not draining, and the database answers."""
+    if not worker_state['ready']:
+        raise HTTPException(status_code=503, detail="Draining" if worker_state['draining'] else "Starting")
+    return await health()
+
 # ============= IMPACT STATS =============
 
 @api_router.get("/stats", response_model=ImpactStats)
 async def get_impact_stats():
-    total_donations = await db.donations.count_documents({"status": "delivered"})
-    active_donors = await db.users.count_documents({"role": "donor"})
+    if impact_stats_cache['value'] is not None and impact_stats_cache['expires_at'] > time.monotonic():
+        return impact_stats_cache['value']
     
-    # Get unique delivery locations for communities served
-    orders = await db.orders.find({"status": "delivered"}, {"_id": 0, "delivery_location": 1}).to_list(1000)
-    unique_communities = len(set(order['delivery_location'].get('city', 'Unknown') for order in orders if 'delivery_location' in order))
+    stats = await repos.impact.get()
+    if stats is None:
+        stats = await reconcile_impact_stats()
+    
+    total_donations = stats.get('total_meals', 0)
     
     # Estimate CO2 saved (rough estimate: 2.5 kg CO2 per meal saved from landfill)
     co2_saved = total_donations * 2.5
     
-    return ImpactStats(
+    impact = ImpactStats(
         total_meals=total_donations,
-        active_donors=active_donors,
-        communities_served=max(unique_communities, 1),
+        active_donors=stats.get('active_donors', 0),
+        communities_served=max(stats.get('communities_served', 0), 1),
         co2_saved=round(co2_saved, 2)
     )
+    impact_stats_cache['value'] = impact
+    impact_stats_cache['expires_at'] = time.monotonic() + IMPACT_STATS_CACHE_TTL_SECONDS
+    return impact
 
 # Include the router in the main app
 app.include_router(api_router)
 
+@app.middleware("http")
+async def conditional_get(request: Request, call_next):
+    """Strong ETags for cacheable GET routes; a matching If-None-Match gets a 304
+    without running the handler while the route's collections are unchanged."""
+    policy = match_cache_policy(request.url.path) if request.method == "GET" else None
+    principal = request_principal(request) if policy else None
+    if principal is None:
+        return await call_next(request)
+    
+    collection_names, cache_control = policy
+    key = (principal, request.url.path, request.url.query)
+    versions = collection_versions.snapshot(collection_names)
+    if_none_match = request.headers.get("if-none-match")
+    
+    if if_none_match:
+        for candidate in if_none_match.split(","):
+            if response_cache.is_fresh(key, candidate.strip(), versions):
+                response_cache.not_modified += 1
+                return Response(status_code=304, headers={"ETag": candidate.strip(), "Cache-Control": cache_control})
+    
+    response_cache.misses += 1
+    response = await call_next(request)
+    if response.status_code != 200:
+        return response
+    
+    body = b"".join([chunk async for chunk in response.body_iterator])
+    etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+    response_cache.store(key, etag, versions, getattr(request.state, "fresh_until", None))
+    
+    headers = dict(response.headers)
+    headers["ETag"] = etag
+    headers["Cache-Control"] = cache_control
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
+    return Response(content=body, status_code=200, headers=headers, media_type=response.media_type)
+
+@app.middleware("http")
+async def rate_limit(request: Request, call_next):
+    """429 with Retry-After once a client exceeds its route's rate, before any handler work."""
+    policy = match_rate_limit_policy(request.url.path) if RATE_LIMIT_ENABLED and request.method != "OPTIONS" else None
+    if policy is None:
+        return await call_next(request)
+    
+    name, rate, per_user = policy
+    principal = request_principal(request) if per_user else None
+    if principal not in (None, "anonymous"):
+        client_key = f"user:{principal}"
+    else:
+        client_key = f"ip:{client_address(request)}"
+    
+    retry_after = await rate_limiter.check(name, client_key, rate)
+    if retry_after:
+        return JSONResponse(
+            {"detail": "Too many requests, please retry later"},
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            headers={"Retry-After": str(math.ceil(retry_after))}
+        )
+    return await call_next(request)
+
+def route_template(request: Request) -> str:
+    """The path template of the route serving ``request``.
+
+    Responses answered by middleware (304s, 429s) never reach the router, so the
+    route is looked up here; only paths no route matches are "unmatched".
+    """
+    route = request.scope.get("route")
+    if route is not None:
+        return route.path
+    partial = None
+    for candidate in app.router.routes:
+        match, _ = candidate.matches(request.scope)
+        if match == Match.FULL:
+            return candidate.path
+        if match == Match.PARTIAL and partial is None:
+            partial = candidate.path
+    return partial or "unmatched"
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    started_at = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        # Label by route template, not raw path, to keep series cardinality bounded
+        route_path = route_template(request)
+        http_request_seconds.observe(time.perf_counter() - started_at, (request.method, route_path))
+        http_requests_total.inc((request.method, route_path, str(status_code)))
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "ETag", "Retry-After"],
 )
 
 # Configure logging
@@ -472,32 +3211,111 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-@app.on_event("startup")
+async def create_indexes():
+    if db is None:
+        return
+    await ensure_indexes()
+    report = await index_report()
+    for collection_name, collection_report in report.items():
+        if collection_report['missing']:
+            logger.warning(f"Missing indexes on {collection_name}: {collection_report['missing']}")
+        if collection_report['unregistered']:
+            logger.info(f"Unregistered indexes on {collection_name}: {collection_report['unregistered']}")
+
+async def run_migrations():
+    if not RUN_MIGRATIONS_ON_STARTUP or db is None:
+        return
+    for collection_name in ("users", "donations", "orders"):
+        migrated = await migrate_created_at(db[collection_name])
+        if migrated:
+            logger.info(f"Migrated created_at to BSON dates for {migrated} {collection_name}")
+    
+    for collection_name, location_field, geo_field in (
+        ("donations", "location", "geo"),
+        ("orders", "pickup_location", "pickup_geo"),
+        ("orders", "delivery_location", "delivery_geo")
+    ):
+        backfilled = await backfill_geo_points(db[collection_name], location_field, geo_field)
+        if backfilled:
+            logger.info(f"Backfilled {geo_field} for {backfilled} {collection_name}")
+    
+    backfilled = await backfill_expires_at(db.donations)
+    if backfilled:
+        logger.info(f"Backfilled expires_at for {backfilled} donations")
+
 async def initialize_admin():
     """Create admin user if it doesn't exist"""
     admin_email = "admin@secondserve.com"
     admin_password = "admin123"
     
-    # Check if admin exists
-    existing_admin = await db.users.find_one({"email": admin_email}, {"_id": 0})
+    # Skip the bcrypt hash on the usual path where the admin already exists
+    if await repos.users.exists({"email": admin_email}):
+        logger.info(f"Admin user already exists: {admin_email}")
+        return
     
-    if not existing_admin:
-        # Create admin user
-        admin_user = User(
-            email=admin_email,
-            name="Admin User",
-            role="admin"
-        )
-        
-        admin_dict = admin_user.model_dump()
-        admin_dict['created_at'] = admin_dict['created_at'].isoformat()
-        admin_dict['password'] = hash_password(admin_password)
-        
-        await db.users.insert_one(admin_dict)
+    admin_user = User(
+        email=admin_email,
+        name="Admin User",
+        role="admin"
+    )
+    
+    admin_dict = admin_user.model_dump()
+    admin_dict['password'] = await password_hasher.hash(admin_password)
+    
+    # Insert-only upsert: when several workers start together exactly one creates the admin
+    if await repos.users.insert_if_absent({"email": admin_email}, admin_dict):
         logger.info(f"Admin user created: {admin_email}")
     else:
         logger.info(f"Admin user already exists: {admin_email}")
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+async def bootstrap():
+    """One-off data store setup. Every step is idempotent, so workers starting
+    together may all run it; run.py runs it once before starting them instead."""
+    await create_indexes()
+    await run_migrations()
+    await initialize_admin()
+
+background_tasks = []
+
+def start_background_tasks():
+    if EVENT_SOURCE == "auto" and db is not None:
+        background_tasks.append(asyncio.create_task(watch_changes()))
+    background_tasks.append(asyncio.create_task(reconcile_impact_stats_periodically()))
+    background_tasks.append(asyncio.create_task(refresh_donation_matcher_periodically()))
+    background_tasks.append(asyncio.create_task(expire_donations_periodically()))
+    background_tasks.append(status_log.start())
+    background_tasks.append(asyncio.create_task(evict_rate_limit_buckets_periodically()))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Per-worker startup and shutdown. Everything that holds sockets, threads or
+    tasks is created here rather than at import, so each forked worker gets its own."""
+    open_repositories()
+    password_hasher.start()
+    if BOOTSTRAP_ON_STARTUP:
+        await bootstrap()
+    await reconcile_impact_stats()
+    await donation_matcher.rebuild()
+    start_background_tasks()
+    worker_state['ready'] = True
+    worker_state['draining'] = False
+    logger.info(f"Worker {os.getpid()} ready")
+    
+    try:
+        yield
+    finally:
+        # The server has already stopped accepting connections and finished the open
+        # ones by now; run.py fails readiness earlier, as soon as SIGTERM arrives
+        worker_state['ready'] = False
+        worker_state['draining'] = True
+        
+        for task in background_tasks:
+            task.cancel()
+        await asyncio.gather(*background_tasks, return_exceptions=True)
+        background_tasks.clear()
+        await status_log.close()
+        await close_repositories()
+        password_hasher.close()
+        logger.info(f"Worker {os.getpid()} stopped")
+
+app.router.lifespan_context = lifespan
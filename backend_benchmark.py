@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""Micro-benchmarks for SecondServe backend hot paths.
+
+Runs against a real MongoDB (MONGO_URL) using a scratch database that is
+dropped before and after every scenario. Usage:
+
+    MONGO_URL=mongodb://localhost:27017 python backend_benchmark.py admin_stats 10000 100000 1000000
+
+Scenarios listed in CPU_SCENARIOS build their data in memory and need no database.
+"""
+
+import asyncio
+import heapq
+import math
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timezone, timedelta
+from typing import List
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from pydantic import TypeAdapter
+
+os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+os.environ['DB_NAME'] = os.environ.get('BENCH_DB_NAME', 'secondserve_bench')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+
+import server  # noqa: E402
+
+DONATION_STATUSES = ["available", "claimed", "delivered"]
+ORDER_STATUSES = ["pending", "assigned", "in_transit", "delivered", "cancelled"]
+USER_ROLES = ["donor", "recipient", "driver"]
+BATCH_SIZE = 10000
+
+
+class SecondServeBenchmark:
+    def __init__(self, repeats=5):
+        server.open_repositories()
+        self.db = server.db
+        self.repeats = repeats
+        self.results = []
+
+    async def reset(self):
+        await server.client.drop_database(os.environ['DB_NAME'])
+
+    async def seed(self, collection, count, make_doc):
+        batch = []
+        for i in range(count):
+            batch.append(make_doc(i))
+            if len(batch) >= BATCH_SIZE:
+                await collection.insert_many(batch, ordered=False)
+                batch = []
+        if batch:
+            await collection.insert_many(batch, ordered=False)
+
+    async def seed_all(self, count):
+        now = datetime.now(timezone.utc)
+
+        def created_at(i):
+            return now - timedelta(seconds=i)
+
+        await self.seed(self.db.donations, count, lambda i: {
+            "id": str(uuid.uuid4()),
+            "donor_id": f"donor-{i % 500}",
+            "donor_name": "Bench Donor",
+            "food_type": "Bench meal",
+            "quantity": "10 servings",
+            "expiry_date": (now + timedelta(days=1)).isoformat(),
+            "location": {"lat": 40.7 + random.random(), "lng": -74.0 + random.random(), "city": f"City {i % 50}"},
+            "status": random.choice(DONATION_STATUSES),
+            "created_at": created_at(i)
+        })
+        await self.seed(self.db.orders, count, lambda i: {
+            "id": str(uuid.uuid4()),
+            "donation_id": str(uuid.uuid4()),
+            "recipient_id": f"recipient-{i % 500}",
+            "recipient_name": "Bench Recipient",
+            "donor_id": f"donor-{i % 500}",
+            "driver_id": None,
+            "status": random.choice(ORDER_STATUSES),
+            "pickup_location": {"lat": 40.7, "lng": -74.0},
+            "delivery_location": {"lat": 40.8, "lng": -73.9, "city": f"City {i % 50}"},
+            "created_at": created_at(i)
+        })
+        await self.seed(self.db.users, count, lambda i: {
+            "id": str(uuid.uuid4()),
+            "email": f"bench-{i}@secondserve.test",
+            "name": "Bench User",
+            "role": random.choice(USER_ROLES),
+            "created_at": created_at(i)
+        })
+
+    async def time_call(self, func):
+        samples = []
+        for _ in range(self.repeats):
+            started_at = time.perf_counter()
+            await func()
+            samples.append((time.perf_counter() - started_at) * 1000)
+        return samples
+
+    def record(self, scenario, size, variant, samples):
+        self.results.append((scenario, size, variant, statistics.median(samples), max(samples)))
+        print(f"{scenario:<14} {size:>9} {variant:<10} median={statistics.median(samples):9.2f} ms  max={max(samples):9.2f} ms")
+
+    # ----- /admin/stats -----
+
+    async def legacy_admin_stats(self):
+        """The original approach: one sequential count_documents call per status and role."""
+        db = self.db
+        return {
+            "donations": {
+                "total": await db.donations.count_documents({}),
+                "available": await db.donations.count_documents({"status": "available"}),
+                "claimed": await db.donations.count_documents({"status": "claimed"}),
+                "delivered": await db.donations.count_documents({"status": "delivered"}),
+                "expired": await db.donations.count_documents({"status": "expired"})
+            },
+            "orders": {
+                "total": await db.orders.count_documents({}),
+                "pending": await db.orders.count_documents({"status": "pending"}),
+                "assigned": await db.orders.count_documents({"status": "assigned"}),
+                "in_transit": await db.orders.count_documents({"status": "in_transit"}),
+                "delivered": await db.orders.count_documents({"status": "delivered"}),
+                "cancelled": await db.orders.count_documents({"status": "cancelled"})
+            },
+            "users": {
+                "total": await db.users.count_documents({}),
+                "donors": await db.users.count_documents({"role": "donor"}),
+                "recipients": await db.users.count_documents({"role": "recipient"}),
+                "drivers": await db.users.count_documents({"role": "driver"})
+            }
+        }
+
+    async def bench_admin_stats(self, size):
+        await self.reset()
+        await self.seed_all(size)
+        assert await self.legacy_admin_stats() == await server.compute_admin_stats()
+        self.record("admin_stats", size, "before", await self.time_call(self.legacy_admin_stats))
+        self.record("admin_stats", size, "after", await self.time_call(server.compute_admin_stats))
+
+    # ----- list endpoint serialization -----
+
+    def make_donation_docs(self, size, iso_strings):
+        now = datetime.now(timezone.utc)
+        docs = []
+        for i in range(size):
+            created_at = now - timedelta(seconds=i)
+            docs.append({
+                "id": str(uuid.uuid4()),
+                "donor_id": f"donor-{i % 500}",
+                "donor_name": "Bench Donor",
+                "food_type": "Bench meal",
+                "quantity": "10 servings",
+                "expiry_date": (now + timedelta(days=1)).isoformat(),
+                "location": {"lat": 40.7, "lng": -74.0},
+                "status": "available",
+                "created_at": created_at.isoformat() if iso_strings else created_at
+            })
+        return docs
+
+    async def bench_list_serialization(self, size):
+        """Cost of turning one page of Mongo documents into the JSON response body."""
+        adapter = TypeAdapter(List[server.Donation])
+        string_docs = self.make_donation_docs(size, iso_strings=True)
+        date_docs = self.make_donation_docs(size, iso_strings=False)
+
+        async def legacy():
+            docs = [dict(doc) for doc in string_docs]
+            for doc in docs:
+                if isinstance(doc['created_at'], str):
+                    doc['created_at'] = datetime.fromisoformat(doc['created_at'])
+            adapter.dump_json(adapter.validate_python(docs))
+
+        async def native():
+            docs = [dict(doc) for doc in date_docs]
+            adapter.dump_json(adapter.validate_python(docs))
+
+        self.record("list_serial", size, "before", await self.time_call(legacy))
+        self.record("list_serial", size, "after", await self.time_call(native))
+
+    # ----- response encoding (response_model vs fast mode) -----
+
+    async def bench_response_encoding(self, size, requests_per_variant=200):
+        """Per-request wall and CPU time to encode one list response, FastAPI's response_model path vs FAST_RESPONSES."""
+        field = create_response_field(name="Response_get_donations", type_=List[server.Donation])
+        docs = self.make_donation_docs(size, iso_strings=False)
+
+        async def standard():
+            content = await serialize_response(field=field, response_content=docs)
+            JSONResponse(content)
+
+        async def fast():
+            server.FAST_RESPONSES = True
+            try:
+                server.fast_response(docs, server.DONATION_SHAPE)
+            finally:
+                server.FAST_RESPONSES = False
+
+        for variant, func in (("standard", standard), ("fast", fast)):
+            wall, cpu = [], []
+            for _ in range(requests_per_variant):
+                wall_started, cpu_started = time.perf_counter(), time.process_time()
+                await func()
+                wall.append((time.perf_counter() - wall_started) * 1000)
+                cpu.append((time.process_time() - cpu_started) * 1000)
+            wall.sort()
+            p50 = wall[len(wall) // 2]
+            p99 = wall[min(len(wall) - 1, int(len(wall) * 0.99))]
+            self.results.append(("response_enc", size, variant, p50, p99))
+            print(f"{'response_enc':<14} {size:>9} {variant:<10} p50={p50:8.2f} ms  p99={p99:8.2f} ms  cpu/req={statistics.mean(cpu):8.2f} ms")
+
+    # ----- batch route planning -----
+
+    async def bench_route_planning(self, size, max_orders=10):
+        """CPU cost of one batch assignment among ``size`` open orders: nearest-pickup selection, then pickup/delivery ordering."""
+        rng = random.Random(size)
+
+        def point(lat, lng):
+            return {"type": "Point", "coordinates": [lng + rng.random() / 10, lat + rng.random() / 10]}
+
+        orders = [{
+            "id": str(uuid.uuid4()),
+            "pickup_location": {}, "delivery_location": {},
+            "pickup_geo": point(40.7, -74.0), "delivery_geo": point(40.7, -74.0)
+        } for _ in range(size)]
+        origin = (40.75, -73.95)
+        points = server.np.array([server.geo_lat_lng(order['pickup_geo']) for order in orders])
+        selected = []
+
+        async def select():
+            walk = server.nearest_neighbour_walk(origin, points)
+            selected[:] = [orders[next(walk)] for _ in range(min(max_orders, size))]
+
+        async def route():
+            server.plan_route(origin, selected)
+
+        self.record("route_plan", size, "select", await self.time_call(select))
+        self.record("route_plan", size, "route", await self.time_call(route))
+
+    # ----- recipient matching -----
+
+    async def bench_matching(self, size, limit=20):
+        """Rank ``size`` available donations for one recipient: per-document Python scoring vs the NumPy table."""
+        rng = random.Random(size)
+        now = datetime.now(timezone.utc)
+        docs = [{
+            "id": str(uuid.uuid4()),
+            "status": "available",
+            "expiry_date": "",
+            "geo": {"type": "Point", "coordinates": [-74.0 + rng.random(), 40.7 + rng.random()]},
+            "expires_at": now + timedelta(hours=rng.uniform(1, 72)),
+            "dietary_tags": rng.sample(server.DIETARY_TAGS, rng.randint(0, 3))
+        } for _ in range(size)]
+        matcher = server.DonationMatcher()
+        for doc in docs:
+            matcher.observe(doc)
+        origin, preferences = (40.9, -73.6), ["Vegan", "Halal"]
+        wanted = server.dietary_mask(preferences)
+
+        async def python_loop():
+            scored = []
+            for doc in docs:
+                lng, lat = doc['geo']['coordinates']
+                distance = server.haversine_meters(origin[0], origin[1], lat, lng) / 1000
+                dietary = bin(server.dietary_mask(doc['dietary_tags']) & wanted).count("1") / bin(wanted).count("1")
+                hours_left = (doc['expires_at'] - now).total_seconds() / 3600
+                score = (server.MATCH_WEIGHTS["dietary"] * dietary
+                         + server.MATCH_WEIGHTS["distance"] * math.exp(-distance / server.MATCH_DISTANCE_SCALE_KM)
+                         + server.MATCH_WEIGHTS["expiry"] * math.exp(-hours_left / server.MATCH_EXPIRY_SCALE_HOURS))
+                scored.append((score, doc['id']))
+            heapq.nlargest(limit, scored)
+
+        async def numpy_table():
+            matcher.top(origin[0], origin[1], preferences, limit)
+
+        self.record("matching", size, "python", await self.time_call(python_loop))
+        self.record("matching", size, "numpy", await self.time_call(numpy_table))
+
+    async def run(self, scenario, sizes):
+        if scenario in CPU_SCENARIOS:
+            for size in sizes:
+                await getattr(self, f"bench_{scenario}")(size)
+            return
+        try:
+            for size in sizes:
+                await getattr(self, f"bench_{scenario}")(size)
+        finally:
+            await self.reset()
+
+
+CPU_SCENARIOS = ["list_serialization", "response_encoding", "route_planning", "matching"]
+SCENARIOS = ["admin_stats"] + CPU_SCENARIOS
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in SCENARIOS:
+        print(f"Usage: {sys.argv[0]} <{'|'.join(SCENARIOS)}> [sizes...]")
+        return 1
+    default_sizes = [100, 1000] if sys.argv[1] in CPU_SCENARIOS else [10000, 100000, 1000000]
+    sizes = [int(size) for size in sys.argv[2:]] or default_sizes
+    asyncio.run(SecondServeBenchmark().run(sys.argv[1], sizes))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""Local load test for the SecondServe API.
+
+Drives the in-process FastAPI app through an async HTTP client (no network, no
+uvicorn) against a scratch MongoDB database, simulating donors, recipients and
+drivers running the full lifecycle concurrently:
+
+    register -> create_donation -> create_order -> assign_driver -> in_transit -> delivered
+
+Reports throughput, p50/p95/p99 latency per route and error/conflict/throttled rates.
+Results can be saved with --output and compared against a saved run with --baseline.
+With --backend memory the API runs on in-memory repositories and needs no
+database, which isolates application-side latency from MongoDB latency.
+
+    MONGO_URL=mongodb://localhost:27017 python backend_load_test.py --donors 20 --recipients 50 --drivers 20
+    python backend_load_test.py --backend memory
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+
+os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+os.environ['DB_NAME'] = os.environ.get('LOAD_TEST_DB_NAME', 'secondserve_load_test')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+
+import httpx  # noqa: E402
+
+import server  # noqa: E402
+
+CONFLICT_STATUSES = {400, 409}
+THROTTLED_STATUSES = {429}
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+class SecondServeLoadTester:
+    def __init__(self, client, concurrency):
+        self.client = client
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+
+    async def call(self, method, route, url, token=None, **kwargs):
+        """Issue one request and record its latency under the route template."""
+        headers = {'Authorization': f'Bearer {token}'} if token else {}
+        async with self.semaphore:
+            started_at = time.perf_counter()
+            response = await self.client.request(method, url, headers=headers, **kwargs)
+            self.latencies[f"{method} {route}"].append((time.perf_counter() - started_at) * 1000)
+        self.statuses[f"{method} {route}"][response.status_code] += 1
+        return response
+
+    async def register(self, role, index, run_id):
+        # The bcrypt pool sheds load with 429 once PASSWORD_HASH_MAX_PENDING jobs are queued
+        while True:
+            response = await self.call('POST', '/api/auth/register', '/api/auth/register', json={
+                "email": f"load-{run_id}-{role}-{index}@example.com",
+                "password": "load-test-password",
+                "name": f"Load {role.title()} {index}",
+                "role": role
+            })
+            if response.status_code not in THROTTLED_STATUSES:
+                break
+            await asyncio.sleep(float(response.headers.get('Retry-After', '1')))
+        response.raise_for_status()
+        return response.json()['access_token']
+
+    async def donor_flow(self, token, donations):
+        for i in range(donations):
+            await self.call('POST', '/api/donations', '/api/donations', token, json={
+                "food_type": f"Load test meal {i}",
+                "quantity": "10 servings",
+                "prepared_at": time.strftime("%Y-%m-%dT%H:%M"),
+                "expiry_date": time.strftime("%Y-%m-%dT%H:%M", time.localtime(time.time() + 86400)),
+                "location": {"city": "Load City", "lat": 37.77 + random.random() / 10, "lng": -122.42 + random.random() / 10}
+            })
+
+    async def recipient_flow(self, token, claims):
+        for _ in range(claims):
+            response = await self.call('GET', '/api/donations', '/api/donations', token, params={"status_filter": "available", "limit": 20})
+            available = response.json() if response.status_code == 200 else []
+            if not available:
+                return
+            await self.call('POST', '/api/orders', '/api/orders', token, json={
+                "donation_id": random.choice(available)['id'],
+                "dietary_preferences": ["Vegetarian"],
+                "delivery_location": {"city": f"District {random.randint(1, 10)}", "lat": 37.78, "lng": -122.41}
+            })
+
+    async def driver_flow(self, token, recipients_done):
+        while True:
+            response = await self.call('GET', '/api/orders/available', '/api/orders/available', token, params={"limit": 20})
+            available = response.json() if response.status_code == 200 else []
+            if not available:
+                if recipients_done.is_set():
+                    return
+                await asyncio.sleep(0.01)
+                continue
+            order_id = random.choice(available)['id']
+            response = await self.call('PATCH', '/api/orders/{order_id}/assign', f'/api/orders/{order_id}/assign', token)
+            if response.status_code != 200:
+                continue
+            for new_status in ("in_transit", "delivered"):
+                await self.call('PATCH', '/api/orders/{order_id}/status', f'/api/orders/{order_id}/status', token, params={"new_status": new_status})
+
+    async def run(self, args):
+        run_id = int(time.time())
+        started_at = time.perf_counter()
+
+        donor_tokens, recipient_tokens, driver_tokens = await asyncio.gather(
+            asyncio.gather(*(self.register('donor', i, run_id) for i in range(args.donors))),
+            asyncio.gather(*(self.register('recipient', i, run_id) for i in range(args.recipients))),
+            asyncio.gather(*(self.register('driver', i, run_id) for i in range(args.drivers)))
+        )
+
+        await asyncio.gather(*(self.donor_flow(token, args.donations_per_donor) for token in donor_tokens))
+
+        recipients_done = asyncio.Event()
+
+        async def recipients():
+            await asyncio.gather(*(self.recipient_flow(token, args.claims_per_recipient) for token in recipient_tokens))
+            recipients_done.set()
+
+        await asyncio.gather(recipients(), *(self.driver_flow(token, recipients_done) for token in driver_tokens))
+        return time.perf_counter() - started_at
+
+    def summary(self, elapsed):
+        routes = {}
+        for route, samples in sorted(self.latencies.items()):
+            samples = sorted(samples)
+            statuses = self.statuses[route]
+            total = sum(statuses.values())
+            conflicts = sum(count for code, count in statuses.items() if code in CONFLICT_STATUSES)
+            throttled = sum(count for code, count in statuses.items() if code in THROTTLED_STATUSES)
+            errors = sum(count for code, count in statuses.items() if code >= 400 and code not in CONFLICT_STATUSES | THROTTLED_STATUSES)
+            routes[route] = {
+                "requests": total,
+                "p50_ms": round(percentile(samples, 0.50), 2),
+                "p95_ms": round(percentile(samples, 0.95), 2),
+                "p99_ms": round(percentile(samples, 0.99), 2),
+                "conflict_rate": round(conflicts / total, 4) if total else 0.0,
+                "throttled_rate": round(throttled / total, 4) if total else 0.0,
+                "error_rate": round(errors / total, 4) if total else 0.0
+            }
+        total_requests = sum(route['requests'] for route in routes.values())
+        return {
+            "elapsed_s": round(elapsed, 3),
+            "requests": total_requests,
+            "throughput_rps": round(total_requests / elapsed, 1) if elapsed else 0.0,
+            "routes": routes
+        }
+
+
+def print_summary(summary, baseline=None):
+    print(f"\n{summary['requests']} requests in {summary['elapsed_s']}s -> {summary['throughput_rps']} req/s")
+    if baseline:
+        print(f"baseline: {baseline['throughput_rps']} req/s")
+    print(f"\n{'route':<40} {'reqs':>6} {'p50':>9} {'p95':>9} {'p99':>9} {'conflict':>9} {'throttled':>9} {'error':>7}")
+    for route, stats in summary['routes'].items():
+        print(f"{route:<40} {stats['requests']:>6} {stats['p50_ms']:>8.2f}ms {stats['p95_ms']:>8.2f}ms {stats['p99_ms']:>8.2f}ms "
+              f"{stats['conflict_rate']:>9.2%} {stats['throttled_rate']:>9.2%} {stats['error_rate']:>7.2%}")
+        previous = (baseline or {}).get('routes', {}).get(route)
+        if previous:
+            print(f"{'  vs baseline':<40} {'':>6} {stats['p50_ms'] - previous['p50_ms']:>+8.2f}ms "
+                  f"{stats['p95_ms'] - previous['p95_ms']:>+8.2f}ms {stats['p99_ms'] - previous['p99_ms']:>+8.2f}ms")
+
+
+async def run_load_test(args):
+    server.REPOSITORY_BACKEND = args.backend
+    # Every simulated user connects from the same address
+    server.RATE_LIMIT_ENABLED = False
+    if args.backend == "mongo":
+        # Start from an empty database before the lifespan bootstraps it, so the
+        # run measures the real indexes rather than unindexed scans
+        server.connect_mongo()
+        await server.client.drop_database(os.environ['DB_NAME'])
+    async with server.app.router.lifespan_context(server.app):
+        try:
+            transport = httpx.ASGITransport(app=server.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://load-test") as client:
+                tester = SecondServeLoadTester(client, args.concurrency)
+                elapsed = await tester.run(args)
+                return tester.summary(elapsed)
+        finally:
+            if server.client is not None:
+                await server.client.drop_database(os.environ['DB_NAME'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--backend', choices=["mongo", "memory"], default="mongo", help="repository backend to run the API on")
+    parser.add_argument('--donors', type=int, default=10)
+    parser.add_argument('--recipients', type=int, default=30)
+    parser.add_argument('--drivers', type=int, default=10)
+    parser.add_argument('--donations-per-donor', type=int, default=10)
+    parser.add_argument('--claims-per-recipient', type=int, default=3)
+    parser.add_argument('--concurrency', type=int, default=64, help="maximum requests in flight")
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--output', help="write the summary as JSON to this file")
+    parser.add_argument('--baseline', help="compare against a summary previously written with --output")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    summary = asyncio.run(run_load_test(args))
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_summary(summary, baseline)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(summary, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
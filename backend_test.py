@@ -4,6 +4,7 @@ import requests
 import sys
 import json
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
 
 class SecondServeAPITester:
     def __init__(self, base_url="https://food-rescue-62.preview.emergentagent.com"):
@@ -370,6 +371,101 @@ class SecondServeAPITester:
         self.log_test("Update Order Status", success, details if not success else "")
         return success
 
+    def test_order_lifecycle(self):
+        """Transitions follow the order state machine: retries succeed, skipped steps and foreign callers are rejected, cancelling releases the donation"""
+        if 'donor' not in self.tokens or 'recipient' not in self.tokens or 'driver' not in self.tokens:
+            self.log_test("Order Lifecycle", False, "Missing donor, recipient or driver token")
+            return False
+
+        tomorrow = (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d")
+        response = self.make_request('POST', 'donations', {
+            "food_type": "Lifecycle test meals",
+            "quantity": "1 meal",
+            "prepared_at": datetime.now().strftime("%Y-%m-%dT%H:%M"),
+            "expiry_date": tomorrow,
+            "location": {"address": "123 Main St", "city": "San Francisco", "lat": 37.7749, "lng": -122.4194}
+        }, self.tokens['donor'])
+        if not response or response.status_code != 200:
+            self.log_test("Order Lifecycle", False, "Could not create donation")
+            return False
+        donation_id = response.json()['id']
+
+        response = self.make_request('POST', 'orders', {
+            "donation_id": donation_id,
+            "delivery_location": {"address": "456 Oak St", "city": "San Francisco", "lat": 37.7849, "lng": -122.4094}
+        }, self.tokens['recipient'])
+        if not response or response.status_code != 200:
+            self.log_test("Order Lifecycle", False, "Could not create order")
+            return False
+        order_id = response.json()['id']
+
+        def set_status(role, new_status):
+            response = self.make_request('PATCH', f'orders/{order_id}/status', token=self.tokens[role], params={'new_status': new_status})
+            return response.status_code if response is not None else None
+
+        checks = {}
+        checks["driver cannot skip to in_transit"] = set_status('driver', 'in_transit') == 403
+        checks["donor cannot cancel"] = set_status('donor', 'cancelled') == 403
+        response = self.make_request('PATCH', f'orders/{order_id}/assign', token=self.tokens['driver'])
+        checks["assign"] = response is not None and response.status_code == 200
+        checks["assigned cannot jump to delivered"] = set_status('driver', 'delivered') == 400
+        checks["recipient cancels"] = set_status('recipient', 'cancelled') == 200
+        checks["cancel retry succeeds"] = set_status('recipient', 'cancelled') == 200
+        checks["cancelled cannot be started"] = set_status('driver', 'in_transit') == 400
+        response = self.make_request('GET', f'donations/{donation_id}', token=self.tokens['recipient'])
+        checks["donation released"] = response is not None and response.status_code == 200 and response.json()['status'] == 'available'
+
+        failed = [name for name, passed in checks.items() if not passed]
+        self.log_test("Order Lifecycle", not failed, f"Failed: {', '.join(failed)}" if failed else "")
+        return not failed
+
+    def test_concurrent_claims(self, attempts=200):
+        """Fire many simultaneous claims at one donation, then many assigns at the resulting order; exactly one of each must win"""
+        if 'donor' not in self.tokens or 'recipient' not in self.tokens or 'driver' not in self.tokens:
+            self.log_test("Concurrent Claims", False, "Missing donor, recipient or driver token")
+            return False
+
+        tomorrow = (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d")
+        donation_data = {
+            "food_type": "Concurrency test meals",
+            "quantity": "1 meal",
+            "prepared_at": datetime.now().strftime("%Y-%m-%dT%H:%M"),
+            "expiry_date": tomorrow,
+            "location": {"address": "123 Main St", "city": "San Francisco", "lat": 37.7749, "lng": -122.4194}
+        }
+        response = self.make_request('POST', 'donations', donation_data, self.tokens['donor'])
+        if not response or response.status_code != 200:
+            self.log_test("Concurrent Claims", False, "Could not create donation")
+            return False
+
+        order_data = {
+            "donation_id": response.json()['id'],
+            "delivery_location": {"address": "456 Oak St", "city": "San Francisco", "lat": 37.7849, "lng": -122.4094}
+        }
+        with ThreadPoolExecutor(max_workers=50) as pool:
+            claims = list(pool.map(
+                lambda _: self.make_request('POST', 'orders', order_data, self.tokens['recipient']),
+                range(attempts)
+            ))
+        winners = [r for r in claims if r is not None and r.status_code == 200]
+        rejected = [r for r in claims if r is not None and r.status_code == 400]
+        success = len(winners) == 1 and len(rejected) == attempts - 1
+        self.log_test("Concurrent Claims", success, f"{len(winners)} winners, {len(rejected)} rejected of {attempts}")
+        if not success:
+            return False
+
+        order_id = winners[0].json()['id']
+        with ThreadPoolExecutor(max_workers=50) as pool:
+            assigns = list(pool.map(
+                lambda _: self.make_request('PATCH', f'orders/{order_id}/assign', token=self.tokens['driver']),
+                range(attempts)
+            ))
+        winners = [r for r in assigns if r is not None and r.status_code == 200]
+        rejected = [r for r in assigns if r is not None and r.status_code == 400]
+        success = len(winners) == 1 and len(rejected) == attempts - 1
+        self.log_test("Concurrent Driver Assignment", success, f"{len(winners)} winners, {len(rejected)} rejected of {attempts}")
+        return success
+
     def run_all_tests(self):
         """Run comprehensive test suite"""
         print("🚀 Starting Second Serve API Tests...")
@@ -406,6 +502,8 @@ class SecondServeAPITester:
         self.test_get_available_orders()
         self.test_assign_driver()
         self.test_update_order_status()
+        self.test_order_lifecycle()
+        self.test_concurrent_claims()
 
         # Final stats check (should show updated numbers)
         self.test_impact_stats()
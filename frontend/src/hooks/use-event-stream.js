@@ -0,0 +1,95 @@
+import { useEffect, useRef } from 'react';
+import axios from 'axios';
+
+const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
+const API = `${BACKEND_URL}/api`;
+const RECONNECT_DELAY_MS = 3000;
+
+export const upsertById = (list, doc) => {
+  const index = list.findIndex((item) => item.id === doc.id);
+  if (index === -1) {
+    return [doc, ...list];
+  }
+  const next = [...list];
+  next[index] = { ...list[index], ...doc };
+  return next;
+};
+
+export const removeById = (list, id) => (
+  list.some((item) => item.id === id) ? list.filter((item) => item.id !== id) : list
+);
+
+// Subscribes to the server's donation/order events. `handlers` maps event types to
+// callbacks receiving the changed document. The stream token is short-lived, so every
+// reconnect fetches a new one, and `onReconnect` runs to catch up on missed events.
+const useEventStream = (handlers, onReconnect) => {
+  const handlersRef = useRef(handlers);
+  const onReconnectRef = useRef(onReconnect);
+  handlersRef.current = handlers;
+  onReconnectRef.current = onReconnect;
+
+  useEffect(() => {
+    let events = null;
+    let retry = null;
+    let closed = false;
+    let connected = false;
+
+    const scheduleReconnect = () => {
+      if (!closed) {
+        retry = setTimeout(connect, RECONNECT_DELAY_MS);
+      }
+    };
+
+    const connect = async () => {
+      let streamToken;
+      try {
+        const token = localStorage.getItem('token');
+        const response = await axios.post(`${API}/events/token`, {}, {
+          headers: { Authorization: `Bearer ${token}` }
+        });
+        streamToken = response.data.token;
+      } catch (error) {
+        console.error('Error opening event stream:', error);
+        if (!error.response || error.response.status !== 401) {
+          scheduleReconnect();
+        }
+        return;
+      }
+      if (closed) {
+        return;
+      }
+
+      events = new EventSource(`${API}/events/stream?token=${encodeURIComponent(streamToken)}`);
+      events.onopen = () => {
+        if (connected && onReconnectRef.current) {
+          onReconnectRef.current();
+        }
+        connected = true;
+      };
+      // EventSource would retry with the same, by then expired, token
+      events.onerror = () => {
+        events.close();
+        scheduleReconnect();
+      };
+      Object.keys(handlersRef.current).forEach((type) => {
+        events.addEventListener(type, (event) => {
+          const handler = handlersRef.current[type];
+          if (handler) {
+            handler(JSON.parse(event.data));
+          }
+        });
+      });
+    };
+
+    connect();
+    return () => {
+      closed = true;
+      clearTimeout(retry);
+      if (events) {
+        events.close();
+      }
+    };
+  }, []);
+};
+
+export default useEventStream;
@@ -18,6 +18,7 @@ const DonorDashboard = ({ user }) => {
     expiry_date: '',
     description: '',
     photo_url: '',
+    dietary_tags: [],
     location: {
       address: '',
       city: '',
@@ -27,6 +28,8 @@ const DonorDashboard = ({ user }) => {
   });
   const [loading, setLoading] = useState(false);
 
+  const dietaryOptions = ['Vegetarian', 'Vegan', 'Halal', 'Kosher', 'Gluten-Free', 'Nut-Free'];
+
   useEffect(() => {
     fetchDonations();
   }, []);
@@ -61,6 +64,7 @@ const DonorDashboard = ({ user }) => {
         expiry_date: '',
         description: '',
         photo_url: '',
+        dietary_tags: [],
         location: { address: '', city: '', lat: 0, lng: 0 }
       });
       fetchDonations();
@@ -71,6 +75,15 @@ const DonorDashboard = ({ user }) => {
     }
   };
 
+  const toggleDietaryTag = (tag) => {
+    setFormData((prev) => ({
+      ...prev,
+      dietary_tags: prev.dietary_tags.includes(tag)
+        ? prev.dietary_tags.filter((t) => t !== tag)
+        : [...prev.dietary_tags, tag]
+    }));
+  };
+
   const handleLogout = () => {
     localStorage.removeItem('token');
     localStorage.removeItem('user');
@@ -200,6 +213,26 @@ const DonorDashboard = ({ user }) => {
                     placeholder="Additional details about the food"
                   />
                 </div>
+                <div>
+                  <label className="block text-sm font-medium text-foreground mb-3">Dietary Tags (Optional)</label>
+                  <div className="flex flex-wrap gap-2">
+                    {dietaryOptions.map((option) => (
+                      <button
+                        key={option}
+                        type="button"
+                        data-testid={`dietary-tag-${option.toLowerCase()}`}
+                        onClick={() => toggleDietaryTag(option)}
+                        className={`px-4 py-2 rounded-full text-sm font-medium transition-all ${
+                          formData.dietary_tags.includes(option)
+                            ? 'bg-primary text-primary-foreground'
+                            : 'bg-background-subtle text-foreground hover:bg-muted'
+                        }`}
+                      >
+                        {option}
+                      </button>
+                    ))}
+                  </div>
+                </div>
                 <div>
                   <label className="block text-sm font-medium text-foreground mb-2">Address</label>
                   <input
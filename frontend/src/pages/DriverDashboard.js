@@ -2,6 +2,7 @@ import React, { useState, useEffect } from 'react';
 import { useNavigate } from 'react-router-dom';
 import { Leaf, LogOut, MapPin, Package, CheckCircle, Truck, Clock, Navigation } from 'lucide-react';
 import axios from 'axios';
+import useEventStream, { upsertById, removeById } from '../hooks/use-event-stream';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
@@ -42,6 +43,24 @@ const DriverDashboard = ({ user }) => {
     }
   };
 
+  // Apply pushed changes locally instead of refetching both lists
+  const applyOrderEvent = (order) => {
+    setAvailableOrders((prev) => (
+      order.status === 'pending' && !order.driver_id ? upsertById(prev, order) : removeById(prev, order.id)
+    ));
+    setMyDeliveries((prev) => (
+      order.driver_id === user?.id ? upsertById(prev, order) : removeById(prev, order.id)
+    ));
+  };
+
+  useEventStream({
+    'order.created': applyOrderEvent,
+    'order.updated': applyOrderEvent
+  }, () => {
+    fetchAvailableOrders();
+    fetchMyDeliveries();
+  });
+
   const handleAcceptOrder = async (orderId) => {
     setLoading(true);
     try {
@@ -59,6 +78,48 @@ const DriverDashboard = ({ user }) => {
     }
   };
 
+  const stopAddress = (location) => (
+    location.lat && location.lng ? `${location.lat},${location.lng}` : `${location.address}, ${location.city}`
+  );
+
+  const handleAcceptBatch = () => {
+    if (!navigator.geolocation) {
+      console.error('Geolocation is not available');
+      return;
+    }
+    setLoading(true);
+    navigator.geolocation.getCurrentPosition(async (position) => {
+      try {
+        const token = localStorage.getItem('token');
+        const response = await axios.post(`${API}/orders/batch-assign`, {
+          lat: position.coords.latitude,
+          lng: position.coords.longitude,
+          max_orders: 5
+        }, {
+          headers: { Authorization: `Bearer ${token}` }
+        });
+        const { stops } = response.data;
+        if (stops.length > 0) {
+          const origin = `${position.coords.latitude},${position.coords.longitude}`;
+          const destination = stopAddress(stops[stops.length - 1].location);
+          const waypoints = stops.slice(0, -1).map((stop) => stopAddress(stop.location)).join('|');
+          const url = `https://www.google.com/maps/dir/?api=1&origin=${encodeURIComponent(origin)}&destination=${encodeURIComponent(destination)}&waypoints=${encodeURIComponent(waypoints)}`;
+          window.open(url, '_blank');
+        }
+        fetchAvailableOrders();
+        fetchMyDeliveries();
+        setActiveTab('deliveries');
+      } catch (error) {
+        console.error('Error accepting nearby orders:', error);
+      } finally {
+        setLoading(false);
+      }
+    }, (error) => {
+      console.error('Error getting location:', error);
+      setLoading(false);
+    });
+  };
+
   const handleUpdateStatus = async (orderId, newStatus) => {
     try {
       const token = localStorage.getItem('token');
@@ -166,6 +227,19 @@ const DriverDashboard = ({ user }) => {
         </div>
 
         {/* Available Orders Tab */}
+        {activeTab === 'available' && availableOrders.length > 0 && (
+          <div className="flex justify-end mb-6">
+            <button
+              onClick={handleAcceptBatch}
+              data-testid="accept-batch-btn"
+              disabled={loading}
+              className="bg-primary text-primary-foreground hover:bg-primary-hover h-11 px-6 rounded-full font-medium transition-all duration-300 hover:scale-[1.02] active:scale-[0.98] disabled:opacity-50 flex items-center gap-2"
+            >
+              <Navigation className="w-4 h-4" />
+              Accept Nearby Batch
+            </button>
+          </div>
+        )}
         {activeTab === 'available' && (
           <div className="grid grid-cols-1 md:grid-cols-2 gap-6">
             {availableOrders.length === 0 ? (
@@ -3,6 +3,7 @@ import { useNavigate } from 'react-router-dom';
 import { Package, LogOut, MapPin, Calendar, Filter, ShoppingBag, Clock } from 'lucide-react';
 import axios from 'axios';
 import Logo from '../components/Logo';
+import useEventStream, { upsertById, removeById } from '../hooks/use-event-stream';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
@@ -55,6 +56,28 @@ const RecipientDashboard = ({ user }) => {
     }
   };
 
+  // Apply pushed changes locally; donations leave the list once claimed or expired
+  const applyDonationEvent = (donation) => {
+    setDonations((prev) => (
+      donation.status === 'available' ? upsertById(prev, donation) : removeById(prev, donation.id)
+    ));
+  };
+
+  const applyOrderEvent = (order) => {
+    setOrders((prev) => upsertById(prev, order));
+  };
+
+  useEventStream({
+    'donation.created': applyDonationEvent,
+    'donation.updated': applyDonationEvent,
+    'donation.expired': applyDonationEvent,
+    'order.created': applyOrderEvent,
+    'order.updated': applyOrderEvent
+  }, () => {
+    fetchAvailableDonations();
+    fetchOrders();
+  });
+
   const handleRequestFood = (donation) => {
     setSelectedDonation(donation);
     setShowRequestForm(true);
@@ -90,6 +113,19 @@ const RecipientDashboard = ({ user }) => {
     }
   };
 
+  const handleCancelOrder = async (orderId) => {
+    try {
+      const token = localStorage.getItem('token');
+      await axios.patch(`${API}/orders/${orderId}/status?new_status=cancelled`, {}, {
+        headers: { Authorization: `Bearer ${token}` }
+      });
+      fetchOrders();
+      fetchAvailableDonations();
+    } catch (error) {
+      console.error('Error cancelling order:', error);
+    }
+  };
+
   const toggleDietaryPreference = (pref) => {
     setDietaryPreferences((prev) =>
       prev.includes(pref) ? prev.filter((p) => p !== pref) : [...prev, pref]
@@ -370,6 +406,15 @@ const RecipientDashboard = ({ user }) => {
                           {order.status}
                         </p>
                       </div>
+                      {(order.status === 'pending' || order.status === 'assigned') && (
+                        <button
+                          onClick={() => handleCancelOrder(order.id)}
+                          data-testid={`cancel-order-btn-${order.id}`}
+                          className="border-2 border-border text-foreground hover:bg-muted h-10 px-5 rounded-full text-sm font-medium transition-all duration-300"
+                        >
+                          Cancel Order
+                        </button>
+                      )}
                     </div>
                     <div className="grid grid-cols-1 md:grid-cols-2 gap-4 text-sm">
                       <div>
@@ -0,0 +1,44 @@
+"""Run the API in-process on the memory repositories; no MongoDB is needed."""
+
+import os
+import sys
+from pathlib import Path
+
+import httpx
+import pytest
+
+os.environ['REPOSITORY_BACKEND'] = 'memory'
+os.environ['RATE_LIMIT_ENABLED'] = 'false'
+os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+os.environ.setdefault('DB_NAME', 'secondserve_test')
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'backend'))
+
+import server  # noqa: E402
+
+
+@pytest.fixture
+def anyio_backend():
+    return 'asyncio'
+
+
+@pytest.fixture
+async def client():
+    """An HTTP client for a freshly started app with empty repositories."""
+    async with server.app.router.lifespan_context(server.app):
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://test') as http:
+            yield http
+
+
+@pytest.fixture
+def register(client):
+    async def register(role: str, email: str = None) -> dict:
+        response = await client.post('/api/auth/register', json={
+            'email': email or f'{role}@example.com',
+            'password': 'password123',
+            'name': f'Test {role}',
+            'role': role
+        })
+        assert response.status_code == 200, response.text
+        return {'Authorization': f"Bearer {response.json()['access_token']}"}
+    return register
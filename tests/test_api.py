@@ -0,0 +1,123 @@
+"""End-to-end API behaviour on the memory repositories."""
+
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+
+def donation_data(food_type: str = 'Test meals') -> dict:
+    return {
+        'food_type': food_type,
+        'quantity': '1 meal',
+        'prepared_at': datetime.now().strftime('%Y-%m-%dT%H:%M'),
+        'expiry_date': (datetime.now() + timedelta(days=1)).strftime('%Y-%m-%d'),
+        'location': {'address': '123 Main St', 'city': 'San Francisco', 'lat': 37.7749, 'lng': -122.4194}
+    }
+
+
+ORDER_LOCATION = {'address': '456 Oak St', 'city': 'San Francisco', 'lat': 37.7849, 'lng': -122.4094}
+
+
+async def test_donations_page_through_cursor(client, register):
+    donor = await register('donor')
+    created = []
+    for number in range(5):
+        response = await client.post('/api/donations', json=donation_data(f'Meal {number}'), headers=donor)
+        assert response.status_code == 200, response.text
+        created.append(response.json()['id'])
+
+    seen, params = [], {'limit': 2}
+    while True:
+        response = await client.get('/api/donations', params=params, headers=donor)
+        assert response.status_code == 200, response.text
+        seen.extend(donation['id'] for donation in response.json())
+        cursor = response.headers.get(server.NEXT_CURSOR_HEADER)
+        if cursor is None:
+            break
+        params = {'limit': 2, 'cursor': cursor}
+
+    assert seen == created[::-1]
+
+
+async def test_invalid_cursor_is_rejected(client, register):
+    donor = await register('donor')
+
+    response = await client.get('/api/donations', params={'cursor': 'not-a-cursor'}, headers=donor)
+
+    assert response.status_code == 400
+
+
+async def test_concurrent_claims_have_exactly_one_winner(client, register, attempts=200):
+    """Many simultaneous claims on one donation, then many assigns of the resulting order."""
+    donor = await register('donor')
+    recipient = await register('recipient')
+    driver = await register('driver')
+    response = await client.post('/api/donations', json=donation_data('Concurrency test meals'), headers=donor)
+    order_data = {'donation_id': response.json()['id'], 'delivery_location': ORDER_LOCATION}
+
+    claims = await asyncio.gather(*(
+        client.post('/api/orders', json=order_data, headers=recipient) for _ in range(attempts)
+    ))
+    winners = [claim for claim in claims if claim.status_code == 200]
+    rejected = [claim for claim in claims if claim.status_code == 400]
+    assert (len(winners), len(rejected)) == (1, attempts - 1)
+
+    order_id = winners[0].json()['id']
+    assigns = await asyncio.gather(*(
+        client.patch(f'/api/orders/{order_id}/assign', headers=driver) for _ in range(attempts)
+    ))
+    winners = [assign for assign in assigns if assign.status_code == 200]
+    rejected = [assign for assign in assigns if assign.status_code == 400]
+    assert (len(winners), len(rejected)) == (1, attempts - 1)
+
+
+async def test_concurrent_registrations_with_one_email_have_one_winner(client):
+    payload = {'email': 'same@example.com', 'password': 'password123', 'name': 'Same', 'role': 'donor'}
+
+    responses = await asyncio.gather(*(client.post('/api/auth/register', json=payload) for _ in range(5)))
+
+    assert sorted(response.status_code for response in responses) == [200, 400, 400, 400, 400]
+    assert all(response.json()['detail'] == 'Email already registered' for response in responses if response.status_code == 400)
+
+
+async def test_bulk_create_reports_each_bad_item_on_its_own(client, register):
+    donor = await register('donor')
+
+    response = await client.post('/api/donations/bulk', headers=donor, json=[donation_data(), 'not a donation', {'food_type': 'Soup'}])
+
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert (body['created'], body['failed']) == (1, 2)
+    assert [result['status'] for result in body['results']] == ['created', 'error', 'error']
+    assert body['results'][1]['errors'] == ['Item must be a JSON object']
+
+
+async def test_bulk_upload_rejects_files_that_are_not_utf8(client, register):
+    donor = await register('donor')
+    content = 'food_type,quantity\nCrème brûlée,4\n'.encode('latin-1')
+
+    response = await client.post('/api/donations/bulk/upload', headers=donor, files={'file': ('donations.csv', content, 'text/csv')})
+
+    assert response.status_code == 400
+    assert response.json()['detail'] == 'Upload must be UTF-8 encoded'
+
+
+async def test_metrics_endpoint_is_disabled_without_a_token(client, monkeypatch):
+    monkeypatch.setattr(server, 'METRICS_TOKEN', None)
+
+    assert (await client.get('/api/metrics')).status_code == 404
+
+
+async def test_metrics_endpoint_requires_its_token(client, monkeypatch):
+    monkeypatch.setattr(server, 'METRICS_TOKEN', 'scrape-secret')
+
+    assert (await client.get('/api/metrics')).status_code == 401
+    assert (await client.get('/api/metrics', headers={'Authorization': 'Bearer wrong'})).status_code == 401
+    response = await client.get('/api/metrics', headers={'Authorization': 'Bearer scrape-secret'})
+    assert response.status_code == 200
+    assert 'secondserve_http_requests_total' in response.text
@@ -0,0 +1,118 @@
+"""ETag revalidation: 304 only while the response could not have changed."""
+
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+
+class Clock:
+    """Moves server time forward, for both time.time() and datetime.now()."""
+
+    def __init__(self, monkeypatch):
+        self.offset = timedelta()
+        clock = self
+
+        class ShiftedDatetime(datetime):
+            @classmethod
+            def now(cls, tz=None):
+                return datetime.now(tz) + clock.offset
+
+        real_time = time.time
+        monkeypatch.setattr(server, 'datetime', ShiftedDatetime)
+        monkeypatch.setattr(server.time, 'time', lambda: real_time() + clock.offset.total_seconds())
+
+    def advance(self, delta: timedelta) -> None:
+        self.offset += delta
+
+
+LISTINGS = [
+    ('/api/donations', {'status_filter': 'available'}),
+    ('/api/donations/nearby', {'lat': 37.7749, 'lng': -122.4194}),
+    ('/api/donations/matches', {'lat': 37.7749, 'lng': -122.4194}),
+]
+
+
+async def create_donation(client, donor: dict, expires_in: timedelta) -> dict:
+    response = await client.post('/api/donations', headers=donor, json={
+        'food_type': 'Soup',
+        'quantity': '4 bowls',
+        'prepared_at': datetime.now().strftime('%Y-%m-%dT%H:%M'),
+        'expiry_date': (datetime.now(timezone.utc) + expires_in).isoformat(timespec='seconds'),
+        'location': {'address': '123 Main St', 'city': 'San Francisco', 'lat': 37.7749, 'lng': -122.4194}
+    })
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+async def test_unchanged_response_revalidates_with_304(client, register):
+    donor = await register('donor')
+    donation = await create_donation(client, donor, timedelta(days=1))
+    path = f"/api/donations/{donation['id']}"
+
+    first = await client.get(path, headers=donor)
+    second = await client.get(path, headers={**donor, 'If-None-Match': first.headers['ETag']})
+
+    assert first.status_code == 200
+    assert second.status_code == 304
+    assert second.headers['ETag'] == first.headers['ETag']
+
+
+async def test_write_to_the_collection_invalidates_the_etag(client, register):
+    donor = await register('donor')
+    await create_donation(client, donor, timedelta(days=1))
+    first = await client.get('/api/donations', headers=donor)
+
+    await create_donation(client, donor, timedelta(days=1))
+    second = await client.get('/api/donations', headers={**donor, 'If-None-Match': first.headers['ETag']})
+
+    assert second.status_code == 200
+    assert len(second.json()) == 2
+
+
+async def test_revalidation_skips_the_handler(client, register):
+    donor = await register('donor')
+    first = await client.get('/api/donations', headers=donor)
+    handler_runs = server.response_cache.misses
+
+    second = await client.get('/api/donations', headers={**donor, 'If-None-Match': f'"stale", {first.headers["ETag"]}'})
+
+    assert second.status_code == 304
+    assert server.response_cache.misses == handler_runs
+
+
+async def test_public_stats_carry_their_cache_control(client):
+    first = await client.get('/api/stats')
+    second = await client.get('/api/stats', headers={'If-None-Match': first.headers['ETag']})
+
+    assert first.headers['Cache-Control'] == 'public, max-age=5'
+    assert second.status_code == 304
+    assert second.headers['Cache-Control'] == 'public, max-age=5'
+
+
+async def test_errors_and_bad_tokens_get_no_etag(client, register):
+    donor = await register('donor')
+
+    missing = await client.get('/api/donations/missing', headers=donor)
+    bad_token = await client.get('/api/donations', headers={'Authorization': 'Bearer not-a-jwt', 'If-None-Match': '*'})
+
+    assert missing.status_code == 404 and 'ETag' not in missing.headers
+    assert bad_token.status_code == 401 and 'ETag' not in bad_token.headers
+
+
+@pytest.mark.parametrize('path, params', LISTINGS)
+async def test_listing_is_not_revalidated_once_a_listed_donation_expires(client, register, monkeypatch, path, params):
+    donor = await register('donor')
+    recipient = await register('recipient')
+    await create_donation(client, donor, timedelta(minutes=5))
+    first = await client.get(path, params=params, headers=recipient)
+    assert first.status_code == 200 and len(first.json()) == 1
+
+    Clock(monkeypatch).advance(timedelta(minutes=10))
+    second = await client.get(path, params=params, headers={**recipient, 'If-None-Match': first.headers['ETag']})
+
+    assert second.status_code == 200
@@ -0,0 +1,73 @@
+"""Who receives which real-time events, and how much of the document they carry."""
+
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import server
+
+ORDER = {
+    'id': 'order-1',
+    'donation_id': 'donation-1',
+    'recipient_id': 'recipient-1',
+    'recipient_name': 'Recipient',
+    'donor_id': 'donor-1',
+    'driver_id': None,
+    'status': 'pending',
+    'dietary_preferences': ['Vegan'],
+    'pickup_location': {'address': '123 Main St'},
+    'delivery_location': {'address': '456 Oak St'}
+}
+
+
+def user(user_id: str, role: str) -> server.User:
+    return server.User(id=user_id, email=f'{user_id}@example.com', name=user_id, role=role)
+
+
+def delivered_payload(viewer: server.User, event: dict):
+    if not server.event_visible_to(viewer, event):
+        return None
+    return json.loads(server.event_payload_for(viewer, event))
+
+
+def test_pending_orders_reach_every_driver_in_full():
+    event = server.make_event('order', 'created', ORDER)
+
+    assert delivered_payload(user('driver-2', 'driver'), event)['delivery_location'] == {'address': '456 Oak St'}
+
+
+def test_other_drivers_only_learn_an_assigned_order_left_the_list():
+    event = server.make_event('order', 'updated', {**ORDER, 'status': 'assigned', 'driver_id': 'driver-1'})
+
+    assert delivered_payload(user('driver-2', 'driver'), event) == {'id': 'order-1', 'status': 'assigned'}
+    assert delivered_payload(user('driver-1', 'driver'), event)['recipient_name'] == 'Recipient'
+    assert delivered_payload(user('recipient-1', 'recipient'), event)['driver_id'] == 'driver-1'
+    assert delivered_payload(user('recipient-2', 'recipient'), event) is None
+
+
+@pytest.mark.anyio
+async def test_expiry_sweep_announces_only_the_donations_it_expired(client, monkeypatch):
+    past = datetime.now(timezone.utc) - timedelta(hours=1)
+    for number in range(3):
+        await server.repos.donations.insert({
+            'id': f'donation-{number}', 'donor_id': 'donor-1', 'status': 'available',
+            'created_at': past, 'expiry_date': past.isoformat(), 'expires_at': past
+        })
+    update_many = server.repos.donations.update_many
+
+    async def claimed_during_sweep(query, changes):
+        await server.repos.donations.update({'id': 'donation-0'}, {'status': 'claimed'})
+        return await update_many(query, changes)
+
+    monkeypatch.setattr(server.repos.donations, 'update_many', claimed_during_sweep)
+    queue = server.event_broker.subscribe()
+    try:
+        assert await server.expire_donations() == 2
+    finally:
+        server.event_broker.unsubscribe(queue)
+
+    events = [queue.get_nowait() for _ in range(queue.qsize())]
+    assert sorted(event['data']['id'] for event in events) == ['donation-1', 'donation-2']
+    assert {event['type'] for event in events} == {'donation.expired'}
+    assert (await server.repos.donations.get({'id': 'donation-0'}))['status'] == 'claimed'
@@ -0,0 +1,108 @@
+"""MemoryRepository must answer queries the way MongoDB does, since the routes run on either."""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from pymongo.errors import DuplicateKeyError
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def donations():
+    return server.memory_repository('donations')
+
+
+async def insert(repository, doc_id: str, minutes: int = 0, **fields):
+    await repository.insert({'id': doc_id, 'created_at': START + timedelta(minutes=minutes), **fields})
+
+
+async def ids(repository, query: dict) -> list:
+    return [doc['id'] for doc in await repository.find(query, {'_id': 0, 'id': 1}, 100)]
+
+
+async def test_page_walks_newest_first_and_breaks_created_at_ties_on_id(donations):
+    for doc_id, minutes in [('a', 0), ('b', 1), ('c', 1), ('d', 2), ('e', 3)]:
+        await insert(donations, doc_id, minutes, status='available')
+
+    seen, after = [], None
+    while True:
+        page = await donations.page({'status': 'available'}, {'_id': 0, 'id': 1, 'created_at': 1}, 2, after)
+        if not page:
+            break
+        seen.extend(doc['id'] for doc in page)
+        after = page[-1]
+
+    assert seen == ['e', 'd', 'c', 'b', 'a']
+
+
+async def test_fetch_page_sets_next_cursor_only_while_documents_remain(donations):
+    for minutes in range(3):
+        await insert(donations, f'd{minutes}', minutes)
+    response = server.Response()
+
+    first = await server.fetch_page(donations, {}, {'_id': 0, 'id': 1, 'created_at': 1}, 2, None, response)
+    cursor = response.headers[server.NEXT_CURSOR_HEADER]
+    response = server.Response()
+    second = await server.fetch_page(donations, {}, {'_id': 0, 'id': 1, 'created_at': 1}, 2, cursor, response)
+
+    assert [doc['id'] for doc in first + second] == ['d2', 'd1', 'd0']
+    assert server.NEXT_CURSOR_HEADER not in response.headers
+
+
+async def test_null_matches_missing_fields_but_exists_does_not(donations):
+    await insert(donations, 'missing', 0)
+    await insert(donations, 'null', 1, driver_id=None)
+    await insert(donations, 'set', 2, driver_id='driver-1')
+
+    assert await ids(donations, {'driver_id': None}) == ['null', 'missing']
+    assert await ids(donations, {'driver_id': {'$ne': None}}) == ['set']
+    assert await ids(donations, {'driver_id': {'$exists': False}}) == ['missing']
+    assert await ids(donations, {'driver_id': {'$exists': True}}) == ['set', 'null']
+
+
+async def test_not_matches_missing_null_and_failing_values(donations):
+    now = START + timedelta(days=1)
+    await insert(donations, 'missing', 0)
+    await insert(donations, 'null', 1, expires_at=None)
+    await insert(donations, 'past', 2, expires_at=now - timedelta(hours=1))
+    await insert(donations, 'future', 3, expires_at=now + timedelta(hours=1))
+
+    assert await ids(donations, {'expires_at': {'$lte': now}}) == ['past']
+    assert await ids(donations, {'expires_at': server.not_expired(now)}) == ['future', 'null', 'missing']
+
+
+async def test_find_and_update_returns_the_original_or_updated_document(donations):
+    await insert(donations, 'd1', status='available')
+
+    before = await donations.find_and_update({'id': 'd1', 'status': 'available'}, {'status': 'claimed'}, original=True)
+    missed = await donations.find_and_update({'id': 'd1', 'status': 'available'}, {'status': 'claimed'}, original=True)
+    after = await donations.find_and_update({'id': 'd1'}, {'status': 'delivered'}, {'_id': 0, 'status': 1})
+
+    assert before['status'] == 'available'
+    assert missed is None
+    assert after == {'status': 'delivered'}
+    assert await ids(donations, {'status': 'delivered'}) == ['d1']
+
+
+async def test_unique_index_rejects_duplicates_on_insert_and_update():
+    users = server.memory_repository('users')
+    await insert(users, 'u1', email='a@example.com')
+    await insert(users, 'u2', 1, email='b@example.com')
+
+    with pytest.raises(DuplicateKeyError):
+        await insert(users, 'u3', 2, email='a@example.com')
+    with pytest.raises(DuplicateKeyError):
+        await users.update({'id': 'u2'}, {'email': 'a@example.com'})
+    errors = await users.insert_many([
+        {'id': 'u4', 'created_at': START, 'email': 'b@example.com'},
+        {'id': 'u5', 'created_at': START, 'email': 'c@example.com'}
+    ])
+
+    assert list(errors) == [0]
+    assert await users.count({}) == 3
+    assert (await users.get({'id': 'u2'}))['email'] == 'b@example.com'
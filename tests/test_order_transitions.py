@@ -0,0 +1,112 @@
+"""Orders move one step at a time along ORDER_TRANSITIONS, and only by the parties allowed to."""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def parties(client, register):
+    donor = await register('donor')
+    recipient = await register('recipient')
+    driver = await register('driver')
+    response = await client.post('/api/donations', headers=donor, json={
+        'food_type': 'Pasta',
+        'quantity': '10 portions',
+        'prepared_at': datetime.now().strftime('%Y-%m-%dT%H:%M'),
+        'expiry_date': (datetime.now() + timedelta(days=1)).strftime('%Y-%m-%d'),
+        'location': {'address': '123 Main St', 'city': 'San Francisco', 'lat': 37.7749, 'lng': -122.4194}
+    })
+    donation_id = response.json()['id']
+    response = await client.post('/api/orders', headers=recipient, json={
+        'donation_id': donation_id,
+        'delivery_location': {'address': '456 Oak St', 'city': 'Oakland', 'lat': 37.8044, 'lng': -122.2712}
+    })
+    assert response.status_code == 200, response.text
+    return {
+        'donor': donor,
+        'recipient': recipient,
+        'driver': driver,
+        'donation_id': donation_id,
+        'order_id': response.json()['id']
+    }
+
+
+async def move(client, parties: dict, role: str, new_status: str):
+    return await client.patch(
+        f"/api/orders/{parties['order_id']}/status",
+        params={'new_status': new_status},
+        headers=parties[role]
+    )
+
+
+async def donation_status(client, parties: dict) -> str:
+    response = await client.get(f"/api/donations/{parties['donation_id']}", headers=parties['donor'])
+    return response.json()['status']
+
+
+async def test_full_lifecycle_delivers_the_donation(client, parties):
+    assert (await client.patch(f"/api/orders/{parties['order_id']}/assign", headers=parties['driver'])).status_code == 200
+
+    assert (await move(client, parties, 'driver', 'in_transit')).status_code == 200
+    assert (await move(client, parties, 'driver', 'delivered')).status_code == 200
+
+    assert await donation_status(client, parties) == 'delivered'
+    stats = (await client.get('/api/stats')).json()
+    assert stats['total_meals'] == 1
+
+
+async def test_steps_cannot_be_skipped(client, parties):
+    await client.patch(f"/api/orders/{parties['order_id']}/assign", headers=parties['driver'])
+
+    response = await move(client, parties, 'driver', 'delivered')
+
+    assert response.status_code == 400
+    assert response.json()['detail'] == 'Cannot change order from assigned to delivered'
+
+
+async def test_repeating_a_transition_succeeds_without_counting_twice(client, parties):
+    await client.patch(f"/api/orders/{parties['order_id']}/assign", headers=parties['driver'])
+    await move(client, parties, 'driver', 'in_transit')
+    await move(client, parties, 'driver', 'delivered')
+
+    assert (await move(client, parties, 'driver', 'delivered')).status_code == 200
+    assert (await client.get('/api/stats')).json()['total_meals'] == 1
+
+
+async def test_only_allowed_roles_may_make_a_transition(client, parties):
+    assert (await move(client, parties, 'recipient', 'in_transit')).status_code == 403
+    assert (await move(client, parties, 'driver', 'cancelled')).status_code == 403
+    assert (await move(client, parties, 'donor', 'cancelled')).status_code == 403
+
+
+async def test_drivers_may_only_move_their_own_orders(client, register, parties):
+    await client.patch(f"/api/orders/{parties['order_id']}/assign", headers=parties['driver'])
+    other_driver = await register('driver', 'other-driver@example.com')
+
+    response = await move(client, {**parties, 'driver': other_driver}, 'driver', 'in_transit')
+
+    assert response.status_code == 403
+
+
+async def test_cancelling_releases_the_donation(client, parties):
+    assert await donation_status(client, parties) == 'claimed'
+
+    assert (await move(client, parties, 'recipient', 'cancelled')).status_code == 200
+
+    assert await donation_status(client, parties) == 'available'
+
+
+async def test_orders_in_transit_cannot_be_cancelled(client, parties):
+    await client.patch(f"/api/orders/{parties['order_id']}/assign", headers=parties['driver'])
+    await move(client, parties, 'driver', 'in_transit')
+
+    assert (await move(client, parties, 'recipient', 'cancelled')).status_code == 400
+
+
+async def test_unknown_status_and_order_are_rejected(client, parties):
+    assert (await move(client, parties, 'driver', 'teleported')).status_code == 400
+    response = await client.patch('/api/orders/missing/status', params={'new_status': 'in_transit'}, headers=parties['driver'])
+    assert response.status_code == 404
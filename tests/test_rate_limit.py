@@ -0,0 +1,113 @@
+"""Token buckets, their eviction, and which client a request is charged to."""
+
+import re
+
+import pytest
+from starlette.requests import Request
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeMonotonic:
+    def __init__(self, monkeypatch):
+        self.now = 1000.0
+        monkeypatch.setattr(server.time, 'monotonic', lambda: self.now)
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    return FakeMonotonic(monkeypatch)
+
+
+def request_from(peer: str, forwarded_for: str = None) -> Request:
+    headers = [(b'x-forwarded-for', forwarded_for.encode())] if forwarded_for else []
+    return Request({'type': 'http', 'client': (peer, 40000), 'headers': headers})
+
+
+async def test_full_bucket_allows_a_burst_then_asks_to_wait_one_interval(clock):
+    store = server.MemoryRateLimitStore(max_keys=10)
+
+    allowed = [await store.take('client', 5, 10) for _ in range(5)]
+    retry_after = await store.take('client', 5, 10)
+
+    assert allowed == [0.0] * 5
+    assert retry_after == pytest.approx(2.0)
+
+
+async def test_bucket_refills_one_token_per_interval(clock):
+    store = server.MemoryRateLimitStore(max_keys=10)
+    for _ in range(5):
+        await store.take('client', 5, 10)
+
+    clock.advance(1.5)
+    assert await store.take('client', 5, 10) == pytest.approx(0.5)
+    clock.advance(0.5)
+    assert await store.take('client', 5, 10) == 0.0
+    assert await store.take('client', 5, 10) == pytest.approx(2.0)
+
+
+async def test_buckets_are_independent_per_key(clock):
+    store = server.MemoryRateLimitStore(max_keys=10)
+
+    assert await store.take('a', 1, 60) == 0.0
+    assert await store.take('a', 1, 60) > 0
+    assert await store.take('b', 1, 60) == 0.0
+
+
+async def test_evict_drops_only_buckets_that_are_full_again(clock):
+    store = server.MemoryRateLimitStore(max_keys=10)
+    await store.take('idle', 1, 10)
+    clock.advance(5)
+    await store.take('busy', 1, 10)
+    clock.advance(5)
+
+    assert await store.evict() == 1
+    assert len(store) == 1
+    assert await store.take('busy', 1, 10) > 0
+
+
+async def test_store_at_capacity_forgets_the_longest_tracked_key(clock):
+    store = server.MemoryRateLimitStore(max_keys=2)
+    await store.take('first', 1, 60)
+    await store.take('second', 1, 60)
+
+    assert await store.take('third', 1, 60) == 0.0
+    assert len(store) == 2
+    assert await store.take('first', 1, 60) == 0.0
+    assert await store.take('third', 1, 60) > 0
+
+
+@pytest.mark.parametrize('peer, forwarded_for, expected', [
+    ('203.0.113.7', None, '203.0.113.7'),
+    ('203.0.113.7', '198.51.100.1', '203.0.113.7'),
+    ('10.0.0.5', '198.51.100.1', '198.51.100.1'),
+    ('10.0.0.5', '6.6.6.6, 198.51.100.1, 10.0.0.9', '198.51.100.1'),
+    ('127.0.0.1', '10.0.0.6', '10.0.0.6'),
+    ('10.0.0.5', 'not-an-ip, 10.0.0.9', 'not-an-ip'),
+])
+def test_client_address_walks_forwarded_for_past_trusted_proxies(peer, forwarded_for, expected):
+    assert server.client_address(request_from(peer, forwarded_for)) == expected
+
+
+async def test_middleware_answers_429_with_retry_after_per_forwarded_client(client, clock, monkeypatch):
+    monkeypatch.setattr(server, 'RATE_LIMIT_ENABLED', True)
+    monkeypatch.setattr(server, 'RATE_LIMIT_POLICIES', [(re.compile(r'^/api/auth/login$'), 'login', (2, 60.0), False)])
+    monkeypatch.setattr(server, 'rate_limiter', server.RateLimiter(server.MemoryRateLimitStore(100)))
+    login = {'email': 'nobody@example.com', 'password': 'wrong'}
+
+    async def attempts(address: str) -> list:
+        return [
+            await client.post('/api/auth/login', json=login, headers={'X-Forwarded-For': address})
+            for _ in range(3)
+        ]
+
+    first, second = await attempts('198.51.100.1'), await attempts('198.51.100.2')
+
+    assert [response.status_code for response in first] == [401, 401, 429]
+    assert first[2].headers['Retry-After'] == '30'
+    assert [response.status_code for response in second] == [401, 401, 429]
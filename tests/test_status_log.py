@@ -0,0 +1,55 @@
+"""The write-behind status event log and the delivery-time report built on it."""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def status_log(client):
+    log = server.StatusEventLog(batch_size=10, flush_seconds=60, max_buffered=100)
+    task = log.start()
+    yield log
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+
+async def test_rejected_events_are_counted_as_dropped_but_duplicates_as_written(status_log, monkeypatch):
+    async def insert_many(docs):
+        return {0: 'E11000 duplicate key error collection: status_events', 1: 'Document failed validation'}
+
+    monkeypatch.setattr(server.repos.status_events, 'insert_many', insert_many)
+    for number in range(3):
+        status_log.record('order', f'order-{number}', 'pending', 'assigned')
+
+    assert await status_log.flush() == 2
+    stats = status_log.stats()
+    assert (stats['written'], stats['dropped'], stats['buffered']) == (2, 1, 0)
+
+
+async def test_delivery_report_keeps_the_most_recent_events_when_truncated(client, monkeypatch):
+    start = datetime.now(timezone.utc) - timedelta(hours=1)
+    timeline = [
+        ('old', 'pending', 0), ('old', 'assigned', 10),
+        ('new', 'pending', 20), ('new', 'assigned', 25), ('new', 'in_transit', 30), ('new', 'delivered', 50),
+    ]
+    for number, (order_id, to_status, minute) in enumerate(timeline):
+        await server.repos.status_events.insert({
+            'id': f'event-{number}', 'kind': 'order', 'entity_id': order_id, 'to_status': to_status,
+            'created_at': start + timedelta(minutes=minute)
+        })
+    monkeypatch.setattr(server, 'STATUS_EVENT_ANALYTICS_MAX_EVENTS', 4)
+
+    report = await server.delivery_time_report(start)
+
+    assert report['truncated'] is True
+    assert report['covered_from'] == start + timedelta(minutes=20)
+    assert report['stages']['pending_to_assigned'] == {
+        'orders': 1, 'mean_minutes': 5.0, 'p50_minutes': 5.0, 'p90_minutes': 5.0
+    }
+    assert report['stages']['in_transit_to_delivered']['mean_minutes'] == 20.0